@@ -8,6 +8,9 @@ import numpy as np
 import pandas as pd
 import random
 
+# Data directory: Lectures/Data, or $EDS_DATA_DIR if set (see eds/wq_loader.py)
+from eds.wq_loader import data_path
+
 # ==============================================================================
 # EXERCISE 1: Variables and Vectors
 # ==============================================================================
@@ -75,7 +78,7 @@ print("\n--- Exercise 2 ---")
 
 # Import with explicit handling of NAs
 water_data = pd.read_csv(
-    "/Users/akashkoppa/Documents/teaching/env-data-science/Lectures/Data/02_Algorithms/water_quality.csv",
+    data_path("02_Algorithms", "water_quality.csv"),
     na_values=["", "NA", "N/A", "-999", "-9999"]
 )
 
@@ -115,22 +118,27 @@ print(missing_summary)
 
 # 3 & 4. Validation checks (Plausible ranges)
 # Temp: 0-35, DO: 0-15, pH: 6-9
-invalid_condition = (
-    (water_data["temp_c"] < 0) | (water_data["temp_c"] > 35) |
-    (water_data["do_mg_l"] < 0) | (water_data["do_mg_l"] > 15) |
-    (water_data["ph"] < 6) | (water_data["ph"] > 9)
-)
+# The ranges are declared once as rules (eds/validation.py). Each row gets a
+# bitmask of the rules it broke; NaN readings never break a rule.
+from eds.validation import VALID_RANGES, compile_rules, range_rules
 
-# Replace NaN in condition with False
-invalid_condition = invalid_condition.fillna(False)
+validator = compile_rules(range_rules(VALID_RANGES))
+violations = validator.check(water_data)
+invalid_condition = violations != 0
 
-invalid_data = water_data[invalid_condition]
+invalid_data = water_data[invalid_condition].assign(
+    violations=validator.describe(violations[invalid_condition]).to_numpy()
+)
 if len(invalid_data) > 0:
     print(f"Found {len(invalid_data)} rows with potentially invalid data:")
     print(invalid_data)
 else:
     print("No data validation issues found based on ranges.")
 
+# For files too large to hold in memory, the same rules run chunk by chunk and
+# the failing rows stream to a CSV, e.g.
+#   stream_water_quality(path, sink="invalid_rows.csv").validation.to_frame()
+
 
 # ==============================================================================
 # EXERCISE 4: Filtering and Selecting
@@ -178,6 +186,26 @@ researcher_req = researcher_req.rename(columns={"do_mg_l": "dissolved_oxygen"})
 print("Researcher Data:")
 print(researcher_req.head())
 
+# The same two requests through a (station, date) index (eds/wq_query.py).
+# Date and station filters become binary searches instead of full scans,
+# which matters once the archive has millions of rows.
+from eds.wq_query import WaterQualityIndex
+
+wq_index = WaterQualityIndex(water_data)
+fisheries_idx = wq_index.query(
+    date="2025-07-23",
+    any_of=[("do_mg_l", "<", 6.0), ("turbidity_ntu", ">", 15)],
+    columns=["station", "date", "do_mg_l", "turbidity_ntu"],
+).sort_values("do_mg_l")
+researcher_idx = wq_index.query(
+    stations=["CB-5.1", "CB-5.2"],
+    where=[("temp_c", "between", (24, 26))],
+    notna=["do_mg_l"],
+    columns=["station", "date", "temp_c", "do_mg_l"],
+).rename(columns={"do_mg_l": "dissolved_oxygen"})
+print("Indexed queries match:",
+      fisheries_idx.equals(fisheries_req), researcher_idx.equals(researcher_req))
+
 
 # ==============================================================================
 # EXERCISE 5: Transforming Data
@@ -278,6 +306,18 @@ station_summary = station_summary.merge(prop_stressed, on="station")
 print("Station Summary:")
 print(station_summary)
 
+# Same summary without loading the whole file: read it in chunks and fold
+# each chunk into per-station accumulators (for archives bigger than RAM)
+from eds.wq_stream import stream_water_quality
+
+stream = stream_water_quality(
+    data_path("02_Algorithms", "water_quality.csv"), chunksize=100
+)
+streamed_summary = stream.station_summary()
+# Every column (counts and maxima included) must agree exactly, dtypes too
+pd.testing.assert_frame_equal(streamed_summary, station_summary, check_exact=True)
+print(f"Streamed {stream.n_rows} rows; matches the in-memory summary")
+
 # Part 2: Station-relative analysis using transform
 # transform() applies a function to each group and returns a Series
 # with the same index as the original DataFrame
@@ -479,20 +519,12 @@ print(classify_water_quality(7.0, 30))   # Heat Stress
 print(classify_water_quality(8.0, 22))   # Good
 
 # 4. Station Summarizer
-def summarize_station(data, station_id):
-    st_data = data[data["station"] == station_id]
-
-    if len(st_data) == 0:
-        print(f"Warning: Station {station_id} not found in data")
-        return None
-
-    return {
-        "station": station_id,
-        "mean_temp": st_data["temp_c"].mean(),
-        "mean_do": st_data["do_mg_l"].mean(),
-        "n_observations": len(st_data),
-        "hypoxic_count": (st_data["do_mg_l"] < 2.0).sum(),
-    }
+# Every station's statistics come from one grouped pass over the data
+# (eds/stations.py). The table is cached per DataFrame, so each call here is
+# a lookup rather than a fresh data[data["station"] == station_id] scan.
+import eds.stations as stations_api
+
+summarize_station = stations_api.summarize_station
 
 # Test (assuming water_enhanced exists)
 result = summarize_station(water_enhanced, "CB-5.1")
@@ -505,25 +537,29 @@ if result:
 # ==============================================================================
 print("\n--- Exercise 10 ---")
 
+# The per-station statistics are computed once (one grouped pass) and the
+# loops below read from that table instead of re-filtering the whole frame
+# for every station.
+summary_table = stations_api.station_summary(water_enhanced)
+
 # Part 1: For loop with printing
 stations = water_enhanced["station"].unique()
 
 for st in stations:
-    st_data = water_enhanced[water_enhanced["station"] == st]
-    mean_temp = st_data["temp_c"].mean()
+    mean_temp = summary_table.loc[st, "mean_temp"]
     print(f"Station {st}: Mean temperature = {mean_temp:.2f} C")
 
 # Part 2: Accumulating results in a list
 station_summaries = []
 
 for st in stations:
-    st_data = water_enhanced[water_enhanced["station"] == st]
+    st_stats = summary_table.loc[st]
 
     station_summaries.append({
         "station": st,
-        "mean_temp": st_data["temp_c"].mean(),
-        "mean_do": st_data["do_mg_l"].mean(),
-        "count": len(st_data),
+        "mean_temp": st_stats["mean_temp"],
+        "mean_do": st_stats["mean_do"],
+        "count": int(st_stats["n_rows"]),
     })
 
 # Convert list of dicts to DataFrame
@@ -551,18 +587,26 @@ for i in range(5):
 
 print(f"Days to hypoxia in 5 simulations: {sim_results}")
 
+# The same simulation for many runs at once: every run advances together as
+# a NumPy array instead of one while loop per run (see eds/hypoxia.py).
+from eds.hypoxia import simulate_days_to_hypoxia
+
+many_days = simulate_days_to_hypoxia(100_000, seed=42)
+print(f"Median days to hypoxia over {len(many_days):,} runs: "
+      f"{np.median(many_days):.0f}")
+
 # Part 4: Building a summary table with a for loop
 # This is the same pattern as Part 2, showing how to accumulate results
 
 results = []
 
 for st in stations:
-    # Filter data for this station
-    st_data = water_enhanced[water_enhanced["station"] == st]
+    # Look up this station's statistics
+    st_stats = summary_table.loc[st]
 
     # Calculate statistics
-    mean_do = st_data["do_mg_l"].mean()
-    n_obs = len(st_data)
+    mean_do = st_stats["mean_do"]
+    n_obs = int(st_stats["n_rows"])
 
     # Create a dictionary with the results
     station_result = {
@@ -10,7 +10,12 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import random
+
+# Typed loader for water_quality.csv (see eds/wq_loader.py): the first call
+# parses the CSV (sentinel NAs, dates, turbidity rename) and caches the result;
+# every later exercise reads the memory-mapped cache instead of re-parsing.
+# Set EDS_DATA_DIR to point at a different data directory.
+from eds.wq_loader import load_water_quality
 
 # =============================================================================
 # EXERCISE 1: Visualizing the Oxygen Profile
@@ -62,9 +67,7 @@ plt.show()
 # =============================================================================
 
 # --- Data Setup (self-contained) ---
-df = pd.read_csv("/Users/akashkoppa/Documents/teaching/env-data-science/Lectures/Data/02_Algorithms/water_quality.csv", na_values=["-999", "-9999"])
-df["date"] = pd.to_datetime(df["date"])
-df = df.rename(columns={"turbidity_ntu": "turbidity"})
+df = load_water_quality(rename_turbidity=True)
 
 # --- Figure: Two-panel missing data pattern ---
 fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
@@ -93,9 +96,7 @@ plt.show()
 # =============================================================================
 
 # --- Data Setup (self-contained) ---
-df = pd.read_csv("/Users/akashkoppa/Documents/teaching/env-data-science/Lectures/Data/02_Algorithms/water_quality.csv", na_values=["-999", "-9999"])
-df["date"] = pd.to_datetime(df["date"])
-df = df.rename(columns={"turbidity_ntu": "turbidity"})
+df = load_water_quality(rename_turbidity=True)
 
 # --- Figure: Four-panel distribution check ---
 fig, axes = plt.subplots(2, 2, figsize=(10, 8))
@@ -134,9 +135,7 @@ plt.show()
 # =============================================================================
 
 # --- Data Setup (self-contained) ---
-df = pd.read_csv("/Users/akashkoppa/Documents/teaching/env-data-science/Lectures/Data/02_Algorithms/water_quality.csv", na_values=["-999", "-9999"])
-df["date"] = pd.to_datetime(df["date"])
-df = df.rename(columns={"turbidity_ntu": "turbidity"})
+df = load_water_quality(rename_turbidity=True)
 
 # --- Filter to July 23rd event data ---
 event = df[(df["date"] == "2025-07-23") &
@@ -187,9 +186,7 @@ plt.show()
 # =============================================================================
 
 # --- Data Setup (self-contained) ---
-df = pd.read_csv("/Users/akashkoppa/Documents/teaching/env-data-science/Lectures/Data/02_Algorithms/water_quality.csv", na_values=["-999", "-9999"])
-df["date"] = pd.to_datetime(df["date"])
-df = df.rename(columns={"turbidity_ntu": "turbidity"})
+df = load_water_quality(rename_turbidity=True)
 
 # --- Derived columns from Lecture 2 Exercise 5 ---
 df["do_percent_sat"] = (df["do_mg_l"] / 8.0) * 100
@@ -237,9 +234,7 @@ plt.show()
 # =============================================================================
 
 # --- Data Setup (self-contained) ---
-df = pd.read_csv("/Users/akashkoppa/Documents/teaching/env-data-science/Lectures/Data/02_Algorithms/water_quality.csv", na_values=["-999", "-9999"])
-df["date"] = pd.to_datetime(df["date"])
-df = df.rename(columns={"turbidity_ntu": "turbidity"})
+df = load_water_quality(rename_turbidity=True)
 
 # --- Station summary from Lecture 2 Exercise 6 ---
 station_summary = df.groupby("station").agg(
@@ -336,9 +331,7 @@ plt.show()
 # =============================================================================
 
 # --- Data Setup (self-contained) ---
-df = pd.read_csv("/Users/akashkoppa/Documents/teaching/env-data-science/Lectures/Data/02_Algorithms/water_quality.csv", na_values=["-999", "-9999"])
-df["date"] = pd.to_datetime(df["date"])
-df = df.rename(columns={"turbidity_ntu": "turbidity"})
+df = load_water_quality(rename_turbidity=True)
 
 # --- Station metadata from Lecture 2 Exercise 8 ---
 station_meta = pd.DataFrame({
@@ -398,32 +391,21 @@ plt.show()
 # =============================================================================
 
 # --- Data Setup (self-contained) ---
-df = pd.read_csv("/Users/akashkoppa/Documents/teaching/env-data-science/Lectures/Data/02_Algorithms/water_quality.csv", na_values=["-999", "-9999"])
-df["date"] = pd.to_datetime(df["date"])
-df = df.rename(columns={"turbidity_ntu": "turbidity"})
+df = load_water_quality(rename_turbidity=True)
 
 # --- Functions from Lecture 2 Exercise 9 ---
 def calc_saturation_deficit(do_measured, temperature):
     do_saturated = 14.62 - (0.3898 * temperature)
     return do_saturated - do_measured
 
-def classify_water_quality(do_val, temp,
-                           hypoxic_threshold=2.0, stress_threshold=5.0):
-    if pd.isna(do_val) or pd.isna(temp):
-        return "Unknown"
-    if do_val < hypoxic_threshold:
-        return "Critical"
-    if do_val < stress_threshold:
-        return "Stressed"
-    if temp > 28:
-        return "Heat Stress"
-    return "Good"
+# eds.classify.classify_water_quality() classifies one reading; the array
+# version applies the same thresholds to whole columns at once instead of
+# calling the function once per row with df.apply(..., axis=1).
+from eds.classify import classify_water_quality_array
 
 # --- Apply functions to dataset ---
 df["sat_deficit"] = calc_saturation_deficit(df["do_mg_l"], df["temp_c"])
-df["wq_class"] = df.apply(
-    lambda r: classify_water_quality(r["do_mg_l"], r["temp_c"]), axis=1
-)
+df["wq_class"] = classify_water_quality_array(df["do_mg_l"], df["temp_c"])
 
 # --- Figure: Saturation deficit vs temperature ---
 fig, ax = plt.subplots(figsize=(10, 7))
@@ -466,32 +448,24 @@ plt.show()
 # =============================================================================
 
 # --- Data Setup (self-contained) ---
-def simulate_hypoxia():
-    do_level = 8.0
-    trajectory = [do_level]
-    while do_level >= 2.0:
-        do_level -= random.uniform(0.1, 0.5)
-        trajectory.append(do_level)
-    return trajectory
+# All runs advance together as arrays (see eds/hypoxia.py); each row of
+# `trajectories` is one run, NaN-padded after it crosses 2.0 mg/L.
+from eds.hypoxia import simulate_trajectories, stream_days_to_hypoxia, risk_summary
 
 # Run 100 simulations
-random.seed(42)
-sims = [simulate_hypoxia() for _ in range(100)]
-days_to_hypoxia = np.array([len(t) - 1 for t in sims])
+trajectories, days_to_hypoxia = simulate_trajectories(100, seed=42)
 
 # --- Figure A: Simulation Trajectories ---
 fig, ax = plt.subplots(figsize=(10, 6))
 
-max_days = max(len(t) for t in sims)
+max_days = trajectories.shape[1]
 
-for traj in sims:
-    ax.plot(range(len(traj)), traj,
-            color="#457b9d", alpha=0.12, linewidth=0.8)
+ax.plot(trajectories.T, color="#457b9d", alpha=0.12, linewidth=0.8)
 
 # Highlight median trajectory
 median_days = np.median(days_to_hypoxia)
 median_idx = np.argmin(np.abs(days_to_hypoxia - median_days))
-ax.plot(range(len(sims[median_idx])), sims[median_idx],
+ax.plot(trajectories[median_idx],
         color="#d62828", linewidth=2.5, label="Median trajectory")
 
 # Threshold reference lines
@@ -557,3 +531,19 @@ print(f"In {pct_fast:.0f}% of simulations, critical conditions developed "
       f"within {int(fast_threshold)} days.")
 print(f"Summary quantiles (5th, 25th, 50th, 75th, 95th): "
       f"{', '.join(f'{int(q)}' for q in quantiles)}")
+
+# --- Large-sample Risk Statement ---
+# For a stable risk statement use many more runs. The streaming simulator
+# keeps only a histogram of days-to-hypoxia, so memory does not grow with
+# the number of runs and the quantiles are still exact.
+n_risk_runs = 1_000_000
+risk = risk_summary(stream_days_to_hypoxia(n_risk_runs, seed=42))
+
+print(f"\n--- Risk Statement ({n_risk_runs:,} simulations) ---")
+print(f"Critical hypoxia is expected within "
+      f"{risk['min_days']}-{risk['max_days']} days, "
+      f"with a median of {int(risk['median_days'])} days.")
+print(f"In {risk['pct_fast']:.0f}% of simulations, critical conditions developed "
+      f"within {int(risk['fast_threshold'])} days.")
+print(f"Summary quantiles (5th, 25th, 50th, 75th, 95th): "
+      f"{', '.join(f'{int(q)}' for q in risk['quantiles'].values())}")
@@ -22,11 +22,6 @@ import rasterio
 from rasterio.transform import from_bounds
 import rasterio.features
 
-import xarray as xr
-from pyproj import Geod
-
-from rasterstats import zonal_stats
-
 warnings.filterwarnings("ignore")
 
 
@@ -119,9 +114,13 @@ print("\nFigure saved: ex01_stations.png")
 low_do_id = stations_gdf.loc[stations_gdf['mean_do_mgl'].idxmin(), 'station_id']
 print(f"\nLowest mean DO station: {low_do_id}")
 
-# Load its time series (filename uses hyphens for slashes in station IDs)
-ts_fname = low_do_id.replace('/', '-') + '.csv'
-ts_data = pd.read_csv(f"station_data/{ts_fname}", parse_dates=['date'])
+# Load its time series from the packed station store. The first call imports
+# every station_data/<id>.csv (hyphens stand for slashes in station IDs) into
+# station_data.store/; later reads are a binary search on memory-mapped arrays.
+from eds.station_store import open_station_store
+
+station_store = open_station_store("station_data", station_ids=stations_gdf["station_id"])
+ts_data = station_store.read(low_do_id, "2015", "2022", columns=["do_mgl", "wtemp_c"])
 print(ts_data.head())
 print(f"Date range: {ts_data['date'].min()} to {ts_data['date'].max()}")
 print(f"Mean DO: {ts_data['do_mgl'].mean():.2f} mg/L  |  Mean Temp: {ts_data['wtemp_c'].mean():.1f} °C")
@@ -172,7 +171,12 @@ print(f"CRS (original): {ws.crs}")
 # --- Reproject to UTM Zone 18N (EPSG:32618, units = meters) ---
 # Area calculations in geographic degrees are meaningless because the size
 # of a degree varies with latitude; 1° longitude ≈ 86 km at 39°N vs 111 km at equator.
-ws_proj = ws.to_crs("EPSG:32618")
+# The same layers are reprojected in several exercises; eds.reproject.to_crs
+# transforms each (layer, target CRS) once per session with a shared
+# pyproj Transformer and returns the cached result afterwards.
+from eds.reproject import to_crs
+
+ws_proj = to_crs(ws, "EPSG:32618")
 print(f"CRS after reprojection: {ws_proj.crs}")
 
 # --- Compute area in km² ---
@@ -332,42 +336,39 @@ print(f"  NoData cells     : {nodata_cells:,} ({100*nodata_cells/total_cells:.1f
 # Low  :   0 – 100 m  (class 1)
 # Mid  : 100 – 300 m  (class 2)
 # High : > 300 m      (class 3)
-dem_class = np.full_like(dem, np.nan)
-dem_class[(dem >= 0)   & (dem < 100)] = 1
-dem_class[(dem >= 100) & (dem < 300)] = 2
-dem_class[dem >= 300]                  = 3
+# The break table is compiled once into a single np.digitize over sorted
+# edges; the result is uint8 with 0 for NaN and values below 0 m.
+from eds.reclassify import Reclassifier
+
+dem_rules = Reclassifier.from_breaks([(0, 100, 1), (100, 300, 2), (300, np.inf, 3)])
+dem_class = dem_rules(dem)
 
 zone_labels = {1: "Low (0–100 m)", 2: "Mid (100–300 m)", 3: "High (>300 m)"}
 print("\nElevation zone coverage:")
 for zone, label in zone_labels.items():
-    n = int(np.nansum(dem_class == zone))
+    n = int(np.count_nonzero(dem_class == zone))
     pct = n / valid_cells * 100
     print(f"  {label}: {n:,} cells ({pct:.1f}%)")
 
-# --- Build a lat/lon extent tuple for imshow ---
-extent_deg = [dem_bounds.left, dem_bounds.right, dem_bounds.bottom, dem_bounds.top]
+# --- Maps are read at display resolution ---
+# The statistics above need every cell, but a 150-dpi panel only shows a few
+# hundred pixels across. show_raster reads the DEM resampled to the axes'
+# pixel size (from an overview level when the file has one), so the maps
+# cost the same for a 300 m regional DEM as for a continental one.
+from eds.render import add_boundaries, show_raster
 
 # --- Reproject watershed polygons to match DEM CRS for overlay ---
-ws_dem = ws.to_crs(str(dem_crs))
+ws_dem = to_crs(ws, dem_crs)
 
 # --- Plot 1: continuous DEM with terrain colormap ---
 fig, axes = plt.subplots(1, 2, figsize=(13, 6))
 
 ax = axes[0]
-im = ax.imshow(dem, cmap="terrain", extent=extent_deg, origin="upper", aspect="auto")
+im = show_raster(ax, dem_path, cmap="terrain", aspect="auto")
 cbar = fig.colorbar(im, ax=ax, fraction=0.03, pad=0.03)
 cbar.set_label("Elevation (m)")
-# Overlay watershed boundaries
-for geom in ws_dem.geometry:
-    if geom is None:
-        continue
-    if geom.geom_type == "Polygon":
-        geoms = [geom]
-    else:
-        geoms = list(geom.geoms)
-    for g in geoms:
-        xs, ys = g.exterior.xy
-        ax.plot(xs, ys, color="black", linewidth=0.4, alpha=0.6)
+# Overlay watershed boundaries (all rings as one LineCollection artist)
+add_boundaries(ax, ws_dem, color="black", linewidth=0.4, alpha=0.6)
 ax.set_title("Continuous DEM\n(with watershed boundaries)", fontweight="bold")
 ax.set_xlabel("Longitude")
 ax.set_ylabel("Latitude")
@@ -377,23 +378,16 @@ ax = axes[1]
 cmap_class = ListedColormap(["#a8ddb5", "#fdae61", "#d7191c"])  # Low/Mid/High
 bounds_class = [0.5, 1.5, 2.5, 3.5]
 norm_class = BoundaryNorm(bounds_class, cmap_class.N)
-ax.imshow(dem_class, cmap=cmap_class, norm=norm_class,
-          extent=extent_deg, origin="upper", aspect="auto")
+# Same display-resolution read, classified with the zone rules before drawing
+show_raster(ax, dem_path, cmap=cmap_class, norm=norm_class, aspect="auto",
+            transform=lambda d: np.ma.masked_equal(
+                dem_rules(d.astype(float).filled(np.nan)), 0))
 patches = [mpatches.Patch(color=c, label=l) for c, l in
            zip(["#a8ddb5", "#fdae61", "#d7191c"],
                ["Low (0–100 m)", "Mid (100–300 m)", "High (>300 m)"])]
 ax.legend(handles=patches, loc="upper right", fontsize=8,
           title="Elevation Zone", title_fontsize=9)
-for geom in ws_dem.geometry:
-    if geom is None:
-        continue
-    if geom.geom_type == "Polygon":
-        geoms = [geom]
-    else:
-        geoms = list(geom.geoms)
-    for g in geoms:
-        xs, ys = g.exterior.xy
-        ax.plot(xs, ys, color="black", linewidth=0.4, alpha=0.7)
+add_boundaries(ax, ws_dem, color="black", linewidth=0.4, alpha=0.7)
 ax.set_title("Classified Elevation Zones\n(Low / Mid / High)", fontweight="bold")
 ax.set_xlabel("Longitude")
 
@@ -414,15 +408,20 @@ print("=" * 70)
 
 nc_path = "mswep_monthly.nc"
 
-# --- Load with xarray ---
+# --- Open lazily with xarray + dask ---
 # xarray is the standard library for labeled multi-dimensional arrays.
 # It preserves dimension names (lat, lon, time) and coordinate metadata.
-ds = xr.open_dataset(nc_path)
-print(f"\nDataset variables: {list(ds.data_vars)}")
-print(f"Dimensions: {dict(ds.dims)}")
+# Opening with explicit chunks (whole years along time, tiles in lat/lon)
+# keeps the data on disk until a result is computed, so the same code
+# handles the daily 0.1° MSWEP record that does not fit in memory.
+from eds.climatology import open_precip, precip_climatology
+
+prec_var = open_precip(nc_path, var="precipitation")
+print(f"\nVariable: {prec_var.name}")
+print(f"Dimensions: {dict(zip(prec_var.dims, prec_var.shape))}")
 
-prec_var = ds["precipitation"]
 print(f"\nPrecipitation shape  : {prec_var.shape}  (time, lat, lon)")
+print(f"Chunks               : {tuple(c[0] for c in prec_var.chunks)} (first chunk)")
 print(f"Time range           : {str(prec_var.time.values[0])[:10]} "
       f"to {str(prec_var.time.values[-1])[:10]}")
 print(f"Spatial extent       : lat {float(prec_var.lat.min()):.2f}°–"
@@ -430,25 +429,22 @@ print(f"Spatial extent       : lat {float(prec_var.lat.min()):.2f}°–"
       f"lon {float(prec_var.lon.min()):.2f}°–{float(prec_var.lon.max()):.2f}°")
 print(f"Units: mm/day (multiply by days_in_month to convert to mm/month)")
 
-# --- Convert mm/day → mm/month ---
-# February has 28 days, August has 31; missing this step creates systematic error.
-times    = pd.DatetimeIndex(prec_var.coords["time"].values)
-days_arr = xr.DataArray(times.days_in_month,
-                         coords=[prec_var.coords["time"]], dims=["time"])
-prec_mm = prec_var * days_arr   # now in mm/month
-
-# --- Temporal aggregation ---
-# Annual total: sum the 12 monthly values within each calendar year
-annual = prec_mm.resample(time="YE").sum()
-
-# Long-term mean annual precipitation (average of 2015–2019 annual totals)
-mean_annual = annual.mean(dim="time")
+# --- mm/day → mm/month, annual totals and long-term mean in one lazy graph ---
+# February has 28 days, August has 31; missing the conversion creates
+# systematic error. Each calendar year sits in one time chunk, so the annual
+# sums are computed chunk by chunk in parallel and written to a Zarr store;
+# the mean field and basin series are then read back from that store.
+clim = precip_climatology(prec_var, zarr_path="mswep_annual.zarr",
+                          time_step="monthly")
+annual       = clim.annual          # annual totals (lazy, Zarr-backed)
+mean_annual  = clim.mean_annual     # average of 2015–2019 annual totals
+basin_annual = clim.basin_annual    # spatially-averaged basin total per year
+print(f"Annual totals saved to Zarr: mswep_annual.zarr")
 
 print(f"\nMean annual precipitation range: "
       f"{float(mean_annual.min()):.0f} – {float(mean_annual.max()):.0f} mm/yr")
 
 # Wettest and driest year (spatially-averaged basin total)
-basin_annual = annual.mean(dim=["lat", "lon"])
 years_str    = [str(t)[:4] for t in annual.time.values]
 
 wettest_idx  = int(basin_annual.argmax())
@@ -463,7 +459,8 @@ print("\nBasin-average annual precipitation by year:")
 for yr, val in zip(years_str, basin_annual.values):
     print(f"  {yr}: {val:.0f} mm/yr")
 
-# --- Save mean annual precipitation as a GeoTIFF for use in Exercise 7 ---
+# --- Save mean annual precipitation as a GeoTIFF ---
+# (Exercise 7 summarizes the in-memory array and transform directly.)
 mean_annual_np = mean_annual.values                   # 2-D numpy array
 lats  = mean_annual.lat.values
 lons  = mean_annual.lon.values
@@ -484,16 +481,15 @@ transform_prec  = from_bounds(
 if lats[0] < lats[-1]:
     mean_annual_np = np.flipud(mean_annual_np)
 
-with rasterio.open(
-    mean_annual_tif, "w",
-    driver="GTiff", height=len(lats), width=len(lons),
-    count=1, dtype=np.float32,
-    crs="EPSG:4326", transform=transform_prec, nodata=-9999.0
-) as dst:
-    out_arr = mean_annual_np.astype(np.float32)
-    out_arr[np.isnan(out_arr)] = -9999.0
-    dst.write(out_arr, 1)
-print(f"\nMean annual precipitation GeoTIFF saved: {mean_annual_tif}")
+# Written as a cloud-optimized GeoTIFF: tiled, DEFLATE-compressed with the
+# floating-point predictor and with averaged overviews, so later reads can
+# fetch only the windows or overview level they need.
+from eds.cog import write_cog
+
+out_arr = mean_annual_np.astype(np.float32)
+out_arr[np.isnan(out_arr)] = -9999.0
+write_cog(mean_annual_tif, out_arr, transform_prec, "EPSG:4326", nodata=-9999.0)
+print(f"\nMean annual precipitation GeoTIFF (COG) saved: {mean_annual_tif}")
 
 # --- Map: long-term mean annual precipitation with watershed overlay ---
 fig, ax = plt.subplots(figsize=(9, 6))
@@ -514,7 +510,7 @@ plt.savefig("ex05_precipitation.png", dpi=150, bbox_inches="tight")
 plt.close()
 print("Figure saved: ex05_precipitation.png")
 
-ds.close()
+prec_var.close()
 
 
 # =============================================================================
@@ -535,27 +531,24 @@ print(f"Geometry type: {streams.geom_type.unique()}")
 # --- Reproject to UTM Zone 18N (meters required for buffering) ---
 # Buffering in geographic degrees produces ellipses, not circles, and the
 # "distance" varies with latitude — incorrect for any ground-distance analysis.
-streams_proj    = streams.to_crs("EPSG:32618")
-stations_proj   = stations_gdf.to_crs("EPSG:32618")
+streams_proj    = to_crs(streams, "EPSG:32618")
+stations_proj   = to_crs(stations_gdf, "EPSG:32618")
 print(f"CRS after reprojection: {streams_proj.crs}")
 
-# --- Create buffers at 100 m, 300 m, 500 m ---
-print("\nCreating buffers (this may take a moment for 7,000+ features)...")
-buf_100 = streams_proj.buffer(100)
-buf_300 = streams_proj.buffer(300)
-buf_500 = streams_proj.buffer(500)
+# --- Create and dissolve buffers at 100 m, 300 m, 500 m ---
+# Summing individual buffer areas double-counts where buffers overlap, so
+# each distance must be dissolved (unioned) first. eds.buffers does this
+# tile by tile in parallel, and grows the 300 m and 500 m buffers from the
+# dissolved 100 m one instead of buffering all 7,000+ streams three times.
+from eds.buffers import buffer_union
 
-# --- Dissolve (union) overlapping polygons for each distance ---
-# Summing individual buffer areas double-counts where buffers overlap;
-# unary_union merges all overlapping polygons into a single geometry first.
-print("Dissolving buffer geometries...")
-buf_100_union = buf_100.unary_union
-buf_300_union = buf_300.unary_union
-buf_500_union = buf_500.unary_union
+print("\nCreating and dissolving buffers...")
+buffers = buffer_union(streams_proj, [100, 300, 500]).set_index("buffer_distance")
+buf_500_union = buffers.geometry.loc[500]
 
-area_100 = buf_100_union.area / 1e6
-area_300 = buf_300_union.area / 1e6
-area_500 = buf_500_union.area / 1e6
+area_100 = buffers.loc[100, "area_km2"]
+area_300 = buffers.loc[300, "area_km2"]
+area_500 = buffers.loc[500, "area_km2"]
 
 print(f"\nTotal dissolved buffer areas:")
 print(f"  100 m buffer: {area_100:,.0f} km²")
@@ -567,7 +560,17 @@ print(f"  500 m / 100 m: {area_500/area_100:.2f}x  (linear scaling would give 5.
 print("  (Sub-linear because buffers merge — more overlap at larger distances)")
 
 # --- Identify stations within the 500 m buffer ---
-stations_proj["in_buffer_500m"] = stations_proj.geometry.within(buf_500_union)
+# PolygonIndex cuts the buffers into small prepared pieces in an STRtree, so
+# each point is tested only against the pieces whose bounding box it hits
+# (fast enough for millions of permit/outfall points, same answer as within).
+from eds.containment import PolygonIndex
+
+riparian = PolygonIndex(buffers.geometry)            # rows: 100, 300, 500 m
+zone = riparian.first_zone(stations_proj)             # innermost buffer, -1 = none
+stations_proj["riparian_zone_m"] = np.where(zone >= 0, buffers.index.to_numpy()[zone], np.nan)
+stations_proj["in_buffer_500m"] = zone >= 0
+print("\nStations by innermost riparian buffer:")
+print(stations_proj["riparian_zone_m"].value_counts(dropna=False).sort_index().to_string())
 in_buf = stations_proj[stations_proj["in_buffer_500m"]]
 out_buf = stations_proj[~stations_proj["in_buffer_500m"]]
 
@@ -615,29 +618,26 @@ print("EXERCISE 7: Zonal Statistics — Precipitation per Watershed")
 print("=" * 70)
 
 # --- Align watersheds to the precipitation raster CRS (EPSG:4326) ---
-# Both layers must share the same CRS before rasterstats can intersect them.
-ws_geo = ws.to_crs("EPSG:4326")
+# Both layers must share the same CRS before the polygons can be rasterized
+# onto the precipitation grid.
+ws_geo = to_crs(ws, "EPSG:4326")
 print(f"Watershed CRS: {ws_geo.crs}")
-print(f"Precipitation raster: {mean_annual_tif} (EPSG:4326)")
+print(f"Precipitation raster: in-memory array {mean_annual_np.shape} (EPSG:4326)")
 
 # --- Zonal statistics: mean, min, max, std of annual precipitation per watershed ---
-# rasterstats.zonal_stats accepts a file path for the raster.
-# It samples raster pixels within each polygon and applies summary functions.
-print("\nComputing zonal statistics...")
-stats = zonal_stats(
-    ws_geo,
-    mean_annual_tif,
-    stats=["mean", "min", "max", "std"],
-    nodata=-9999.0
-)
+# eds.zonal rasterizes all watersheds once into a zone-ID grid on the raster's
+# transform, then summarizes every watershed in one bincount pass over the
+# in-memory array (no GeoTIFF round trip, no per-polygon loop). NaN cells
+# (outside the MSWEP domain) are ignored.
+from eds.zonal import zonal_stats
 
-zonal_df = pd.DataFrame(stats)
-zonal_df.columns = ["precip_mean", "precip_min", "precip_max", "precip_std"]
+print("\nComputing zonal statistics...")
+zonal_df = zonal_stats(ws_geo, mean_annual_np, transform_prec,
+                       stats=["mean", "min", "max", "std"], prefix="precip_")
 
 # --- Join results back to the watershed GeoDataFrame ---
-# zonal_stats returns a list in the same row order as the input GeoDataFrame
-ws_with_precip = ws_proj.reset_index(drop=True).copy()
-ws_with_precip = pd.concat([ws_with_precip, zonal_df], axis=1)
+# zonal_stats returns a DataFrame aligned to the watershed index
+ws_with_precip = ws_proj.join(zonal_df)
 
 print("\nPrecipitation statistics per watershed (mm/yr) — first 8 rows:")
 print(ws_with_precip[["Name", "area_km2", "precip_mean", "precip_std"]].head(8).to_string(index=False))
@@ -723,22 +723,22 @@ print("=" * 70)
 
 nlcd_path = "nlcd_chesapeake.tif"
 
-# --- Load NLCD (EPSG:5070 Albers Equal Area) ---
+# --- NLCD metadata (EPSG:5070 Albers Equal Area) ---
+# The 30 m grid is too large to read in one piece, so only the metadata is
+# read here; the pixels are processed block by block below.
 with rasterio.open(nlcd_path) as src:
-    nlcd         = src.read(1)
     nlcd_nodata  = src.nodata
     nlcd_crs     = src.crs
     nlcd_transform = src.transform
     nlcd_height  = src.height
     nlcd_width   = src.width
+    nlcd_blocks  = src.block_shapes[0]
 
 print(f"\nNLCD CRS          : {nlcd_crs}")
 print(f"NLCD shape        : {nlcd_height} rows x {nlcd_width} cols")
+print(f"NLCD block size   : {nlcd_blocks[0]} x {nlcd_blocks[1]}")
 print(f"NLCD nodata value : {nlcd_nodata}")
 
-unique_vals = np.unique(nlcd[nlcd != nlcd_nodata]) if nlcd_nodata is not None else np.unique(nlcd)
-print(f"Unique NLCD class codes: {unique_vals}")
-
 # NLCD class definitions used in Chesapeake dataset
 nlcd_class_names = {
     11: "Open Water", 21: "Developed-Low", 22: "Developed-Med",
@@ -747,71 +747,61 @@ nlcd_class_names = {
     52: "Shrub/Scrub", 71: "Herbaceous", 81: "Hay/Pasture",
     82: "Cultivated Crops", 90: "Woody Wetlands", 95: "Emergent Herbaceous Wetlands"
 }
+
+# --- Reclassify to 4 aggregated categories ---
+# 1 = Forest (41–43), 2 = Agriculture (81–82), 3 = Urban (21–24), 4 = Other,
+# 0 = NoData. NLCD codes are uint8, so the code map compiles to a 256-entry
+# lookup table applied to each block in one gather.
+from eds.raster_blocks import reclass_counts, zone_class_table
+from eds.reclassify import Reclassifier
+
+nlcd_lut = Reclassifier.from_codes(
+    {1: [41, 42, 43], 2: [81, 82], 3: [21, 22, 23, 24]},
+    default=4, nodata=nlcd_nodata, nodata_class=0, size=256,
+)
+
+# --- Reproject watersheds to EPSG:5070 for zonal stats (must match raster CRS) ---
+ws_albers = to_crs(ws, nlcd_crs)
+print(f"Watershed CRS for NLCD zonal stats: {ws_albers.crs}")
+
+# --- One block-windowed pass: class histogram + counts per watershed ---
+# Each window of whole GeoTIFF blocks is read, reclassified and counted per
+# watershed (categorical zonal statistics) by a thread pool, so memory stays
+# bounded by the window size instead of the full raster. The reclassified
+# raster is written along the way as a cloud-optimized GeoTIFF (tiled,
+# compressed, with mode-resampled overviews for quick maps).
+print("\nReclassifying and computing categorical zonal statistics by block...")
+nlcd_reclass_tif = "nlcd_reclass.tif"
+nlcd_counts = reclass_counts(nlcd_path, nlcd_lut, ws_albers,
+                             out_path=nlcd_reclass_tif, out_nodata=0)
+print(f"Reclassified NLCD saved: {nlcd_reclass_tif}")
+
+raw_counts = nlcd_counts.raw.copy()
+if nlcd_nodata is not None:
+    raw_counts[int(nlcd_nodata)] = 0
+unique_vals = np.flatnonzero(raw_counts)
+print(f"Unique NLCD class codes: {unique_vals}")
 print("\nNLCD classes present in dataset:")
 for v in unique_vals:
     if int(v) in nlcd_class_names:
         print(f"  {v:3d}: {nlcd_class_names[int(v)]}")
 
-# --- Reclassify to 4 aggregated categories ---
-# 1 = Forest (41–43), 2 = Agriculture (81–82), 3 = Urban (21–24), 4 = Other
-nlcd_reclass = np.full_like(nlcd, 4, dtype=np.int16)   # default: Other
-nlcd_reclass[np.isin(nlcd, [41, 42, 43])]       = 1   # Forest
-nlcd_reclass[np.isin(nlcd, [81, 82])]            = 2   # Agriculture
-nlcd_reclass[np.isin(nlcd, [21, 22, 23, 24])]   = 3   # Urban
-
-# Mask nodata pixels
-nodata_mask = (nlcd == nlcd_nodata) if nlcd_nodata is not None else np.zeros_like(nlcd, dtype=bool)
-nlcd_reclass[nodata_mask] = 0   # 0 = NoData in reclassified raster
-
-total_valid_nlcd = int(np.sum(nlcd_reclass > 0))
+total_valid_nlcd = int(nlcd_counts.classes[1:].sum())
 print(f"\nReclassified land cover distribution:")
 for code, label in [(1, "Forest"), (2, "Agriculture"), (3, "Urban"), (4, "Other")]:
-    n = int(np.sum(nlcd_reclass == code))
+    n = int(nlcd_counts.classes[code])
     pct = n / total_valid_nlcd * 100 if total_valid_nlcd > 0 else 0
     print(f"  {label}: {n:,} cells ({pct:.1f}%)")
 
-# --- Save reclassified raster as a temporary GeoTIFF for zonal_stats ---
-nlcd_reclass_tif = "nlcd_reclass.tif"
-with rasterio.open(
-    nlcd_reclass_tif, "w",
-    driver="GTiff", height=nlcd_height, width=nlcd_width,
-    count=1, dtype=np.int16,
-    crs=nlcd_crs, transform=nlcd_transform, nodata=0
-) as dst:
-    dst.write(nlcd_reclass.astype(np.int16), 1)
-print(f"\nReclassified NLCD saved: {nlcd_reclass_tif}")
-
-# --- Reproject watersheds to EPSG:5070 for zonal stats (must match raster CRS) ---
-ws_albers = ws.to_crs(str(nlcd_crs))
-print(f"Watershed CRS for NLCD zonal stats: {ws_albers.crs}")
-
-# --- Zonal statistics: count cells per NLCD category per watershed ---
-# categorical=True tells rasterstats to count how many cells of each integer
-# value fall within each polygon — appropriate for class-coded rasters.
-print("\nComputing categorical zonal statistics...")
-lc_stats = zonal_stats(
-    ws_albers,
-    nlcd_reclass_tif,
-    categorical=True,
-    category_map={1: "forest", 2: "agr", 3: "urban", 4: "other"},
-    nodata=0
+# Share of each category per watershed (NoData class 0 is not counted)
+lc_pct = zone_class_table(
+    nlcd_counts, ws_albers,
+    {1: "pct_forest", 2: "pct_agr", 3: "pct_urban", 4: "pct_other"},
+    percent=True,
 )
 
-lc_df = pd.DataFrame(lc_stats).fillna(0)
-
-# Ensure all four categories are present even if a watershed has none
-for col in ["forest", "agr", "urban", "other"]:
-    if col not in lc_df.columns:
-        lc_df[col] = 0.0
-
-# Convert counts to percentages
-lc_totals = lc_df[["forest", "agr", "urban", "other"]].sum(axis=1)
-lc_pct = lc_df[["forest", "agr", "urban", "other"]].div(lc_totals, axis=0) * 100
-lc_pct.columns = ["pct_forest", "pct_agr", "pct_urban", "pct_other"]
-
 # Join back to the watershed GeoDataFrame (already has area_km2 and precip)
-ws_lc = ws_with_precip.reset_index(drop=True).copy()
-ws_lc = pd.concat([ws_lc, lc_pct], axis=1)
+ws_lc = ws_with_precip.join(lc_pct)
 
 print("\nLand cover statistics (% of watershed) — first 8 rows:")
 print(ws_lc[["Name", "pct_forest", "pct_agr", "pct_urban"]].head(8).to_string(index=False))
@@ -856,6 +846,25 @@ plt.savefig("ex08_land_cover.png", dpi=150, bbox_inches="tight")
 plt.close()
 print("\nFigure saved: ex08_land_cover.png")
 
+# --- Map of the reclassified raster, read at display resolution ---
+# nlcd_reclass.tif has mode-resampled overviews, so this reads a few hundred
+# thousand pixels instead of the full 30 m grid.
+fig, ax = plt.subplots(figsize=(7, 8))
+lc_colors = ["#1b7837", "#dfc27d", "#d6604d", "#bababa"]    # forest/agr/urban/other
+show_raster(ax, nlcd_reclass_tif, cmap=ListedColormap(lc_colors),
+            norm=BoundaryNorm([0.5, 1.5, 2.5, 3.5, 4.5], 4))
+add_boundaries(ax, ws_albers, color="black", linewidth=0.4)
+ax.legend(handles=[mpatches.Patch(color=c, label=l) for c, l in
+                   zip(lc_colors, ["Forest", "Agriculture", "Urban", "Other"])],
+          loc="lower right", fontsize=8)
+ax.set_title("Reclassified NLCD 2021 Land Cover", fontweight="bold")
+ax.set_xlabel("Easting (m)")
+ax.set_ylabel("Northing (m)")
+plt.tight_layout()
+plt.savefig("ex08_nlcd_reclass.png", dpi=150, bbox_inches="tight")
+plt.close()
+print("Figure saved: ex08_nlcd_reclass.png")
+
 # --- Scatter: % Agriculture vs mean station DO ---
 ws_lc_do = ws_lc.merge(station_do_by_ws, on="Name", how="left")
 mask = ws_lc_do["mean_do"].notna()
@@ -907,7 +916,7 @@ print("   (This is in DEGREES — not a ground distance. Mixing longitude and la
 print("    degrees is geometrically incorrect because they have different ground lengths.)")
 
 # --- Distance in UTM Zone 18N (meters) — correct planar approximation ---
-stations_utm = stations_gdf.to_crs("EPSG:32618")
+stations_utm = to_crs(stations_gdf, "EPSG:32618")
 p1_utm = stations_utm.geometry.iloc[0]
 p2_utm = stations_utm.geometry.iloc[-1]
 dist_m  = p1_utm.distance(p2_utm)
@@ -915,16 +924,46 @@ dist_km = dist_m / 1000
 print(f"\n2. Euclidean distance in UTM Zone 18N (EPSG:32618): {dist_km:.2f} km")
 
 # --- Geodetic distance using pyproj.Geod (most accurate — follows Earth's ellipsoid) ---
-geod = Geod(ellps="WGS84")
-_az1, _az2, dist_geod_m = geod.inv(p1_geo.x, p1_geo.y, p2_geo.x, p2_geo.y)
+# eds.geodesy runs Geod.inv on whole coordinate arrays, so the same call
+# gives one pair or the full station-to-station distance matrix.
+from eds.geodesy import distance_matrix, geodesic_distance, geodesic_measures, points_lonlat
+
+dist_geod_m  = float(geodesic_distance(p1_geo.x, p1_geo.y, p2_geo.x, p2_geo.y))
 dist_geod_km = dist_geod_m / 1000
 print(f"\n3. Geodetic (ellipsoidal) distance (pyproj.Geod): {dist_geod_km:.2f} km")
 
+# Every station pair: UTM planar vs geodetic distance
+st_lon, st_lat = points_lonlat(stations_gdf)
+d_geod = distance_matrix(st_lon, st_lat)
+st_xy  = np.column_stack([stations_utm.geometry.x, stations_utm.geometry.y])
+d_utm  = np.hypot(st_xy[:, None, 0] - st_xy[None, :, 0], st_xy[:, None, 1] - st_xy[None, :, 1])
+pairs  = np.triu_indices(len(st_lon), k=1)     # each pair of stations once
+pair_geod, pair_utm = d_geod[pairs], d_utm[pairs]
+# Co-located stations (distance 0) have no relative error; count them apart
+co_located = pair_geod == 0
+pair_err = ((pair_utm[~co_located] - pair_geod[~co_located])
+            / pair_geod[~co_located] * 100)
+print(f"   All {pair_geod.size:,} station pairs ({co_located.sum():,} co-located) — "
+      f"UTM vs geodetic distance error: mean {pair_err.mean():.2f}%, "
+      f"range {pair_err.min():.2f}% to {pair_err.max():.2f}%")
+
 pct_err_deg = (dist_deg - dist_km) / dist_km * 100
 pct_err_utm = (dist_km - dist_geod_km) / dist_geod_km * 100
 print(f"\nPercentage error — degree distance vs geodetic: {pct_err_deg:.1f}% (meaningless units)")
 print(f"Percentage error — UTM vs geodetic            : {pct_err_utm:.2f}%")
 
+# --- Area comparison: ellipsoidal vs UTM for every watershed ---
+# Ellipsoidal area and perimeter of all watersheds (every part and hole).
+# These are measured on the WGS84 ellipsoid and need no projection; the UTM
+# planar area next to them (compare_crs) does reproject the layer to UTM.
+ws_geodesic = geodesic_measures(ws, compare_crs="EPSG:32618")
+print("\nEllipsoidal vs UTM Zone 18N area, all watersheds:")
+print(ws_geodesic.join(ws["Name"]).head(8).round(2).to_string(index=False))
+print(f"UTM area error across {len(ws_geodesic)} watersheds: "
+      f"mean {ws_geodesic['area_error_pct'].mean():.2f}%, "
+      f"range {ws_geodesic['area_error_pct'].min():.2f}% to "
+      f"{ws_geodesic['area_error_pct'].max():.2f}%")
+
 # --- Area comparison for one watershed ---
 ws_sel = ws.iloc[[0]]   # first watershed polygon
 ws_name = ws_sel["Name"].values[0]
@@ -936,19 +975,16 @@ print(f"\n(a) Naive planar area in WGS84 (sq. degrees): {area_deg2:.6f} °²")
 print("    (Unit is 'square degrees' — not convertible to km² without latitude correction)")
 
 # (b) UTM Zone 18N: accurate planar area
-ws_sel_utm = ws_sel.to_crs("EPSG:32618")
+ws_sel_utm = to_crs(ws_sel, "EPSG:32618")
 area_utm_km2 = float(ws_sel_utm.geometry.area.values[0]) / 1e6
 print(f"\n(b) UTM Zone 18N (EPSG:32618) projected area: {area_utm_km2:.2f} km²")
 
-# (c) Ellipsoidal area via pyproj.Geod (reference value, accounts for Earth's curvature)
-poly_geom = ws_sel.geometry.values[0]
-if poly_geom.geom_type == "MultiPolygon":
-    poly_geom = max(poly_geom.geoms, key=lambda g: g.area)
-area_m2_geod, _ = geod.geometry_area_perimeter(poly_geom)
-area_geod_km2    = abs(area_m2_geod) / 1e6
+# (c) Ellipsoidal area via pyproj.Geod (reference value, accounts for Earth's
+# curvature; all parts of a MultiPolygon included)
+area_geod_km2 = float(ws_geodesic["area_geod_km2"].iloc[0])
 print(f"\n(c) Ellipsoidal area via pyproj.Geod (WGS84): {area_geod_km2:.2f} km²")
 
-pct_err_area = (area_utm_km2 - area_geod_km2) / area_geod_km2 * 100
+pct_err_area = float(ws_geodesic["area_error_pct"].iloc[0])
 print(f"\nUTM vs. ellipsoidal area error: {pct_err_area:.2f}%")
 
 # --- CRS mismatch demonstration: NLCD (EPSG:5070) vs watersheds (EPSG:4326) ---
@@ -959,8 +995,8 @@ print(f"CRS match             : {str(ws.crs) == str(nlcd_crs)}")
 print("If you overlay without reprojecting, geometries will be in incompatible")
 print("coordinate spaces — the layers will not align spatially.")
 print("Fix: reproject watersheds to match the raster CRS before analysis.")
-ws_fixed = ws.to_crs(str(nlcd_crs))
-print(f"After ws.to_crs(nlcd_crs): {ws_fixed.crs}  (CRS now matches NLCD)")
+ws_fixed = to_crs(ws, nlcd_crs)    # cached: same result as ws_albers in Ex 8
+print(f"After to_crs(ws, nlcd_crs): {ws_fixed.crs}  (CRS now matches NLCD)")
 
 # --- Summary table ---
 print("\n--- Summary Table: CRS and Measurement Method Comparison ---")
@@ -971,6 +1007,7 @@ summary = pd.DataFrame({
         "Distance (2 stations)",
         f"Area ({ws_name})",
         f"Area ({ws_name})",
+        f"Area ({ws_name})",
     ],
     "CRS / Method": [
         "WGS84 EPSG:4326 (degree distance, INCORRECT)",
@@ -978,6 +1015,7 @@ summary = pd.DataFrame({
         "pyproj.Geod WGS84 (geodetic, REFERENCE)",
         "WGS84 EPSG:4326 (square degrees, INCORRECT)",
         "UTM Zone 18N EPSG:32618 (planar)",
+        "pyproj.Geod WGS84 (ellipsoidal, REFERENCE)",
     ],
     "Result": [
         f"{dist_deg:.4f} °",
@@ -985,6 +1023,7 @@ summary = pd.DataFrame({
         f"{dist_geod_km:.2f} km",
         f"{area_deg2:.4f} °²",
         f"{area_utm_km2:.2f} km²",
+        f"{area_geod_km2:.2f} km²",
     ],
     "Notes": [
         "Meaningless units; not a ground distance",
@@ -992,6 +1031,7 @@ summary = pd.DataFrame({
         "Reference value (ellipsoidal model)",
         "Cannot convert to km² without correction",
         f"{pct_err_area:.2f}% error vs geodetic",
+        "Reference value (all parts included)",
     ]
 })
 print(summary.to_string(index=False))
@@ -5,7 +5,7 @@
 # =============================================================================
 # Working directory assumed to be the folder containing all data files.
 # Required packages: geopandas, numpy, scipy, scikit-learn, matplotlib,
-#                    libpysal, esda, splot, pointpats
+#                    libpysal, pointpats
 
 import os
 import warnings
@@ -15,16 +15,9 @@ import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
-from matplotlib.patches import Circle
 from matplotlib.colors import Normalize, ListedColormap, BoundaryNorm
 from matplotlib.cm import ScalarMappable
-from scipy.spatial.distance import cdist
-from scipy.stats import norm, gaussian_kde
-from sklearn.neighbors import KernelDensity
 
-import libpysal
-import esda
-from splot.esda import moran_scatterplot, lisa_cluster
 
 warnings.filterwarnings("ignore")
 
@@ -51,28 +44,37 @@ stations_gdf = gpd.GeoDataFrame(
 print(f"Loaded {len(stations_gdf)} monitoring stations")
 print(stations_gdf[["station_id", "lat", "lon", "mean_do_mgl"]].head())
 
-# --- Mean center (arithmetic mean of coordinates) ---
-coords = np.column_stack([stations_gdf.geometry.x, stations_gdf.geometry.y])
-mc_lon, mc_lat = coords.mean(axis=0)
+# --- Centrography in UTM Zone 18N (meters) ---
+# Degrees are not a distance unit, so the statistics are computed after
+# projecting. eds.centrography does the mean center, standard distance and
+# standard deviational ellipse in one grouped pass (by= for per-group runs).
+from eds.centrography import describe_points, centers, ellipses
+
+UTM_18N = "EPSG:32618"
+unweighted = describe_points(stations_gdf, crs=UTM_18N)
+weighted = describe_points(stations_gdf, weight="mean_do_mgl", crs=UTM_18N)
+mc = unweighted.iloc[0]
+wmc = weighted.iloc[0]
+
+# Centers back in lon/lat for reporting and the map
+mc_lon, mc_lat = centers(unweighted).to_crs(4326).get_coordinates().iloc[0]
+wmc_lon, wmc_lat = centers(weighted).to_crs(4326).get_coordinates().iloc[0]
 print(f"\nMean center: ({mc_lon:.4f}, {mc_lat:.4f})")
-
-# --- Weighted mean center (weight = mean DO) ---
-w = stations_gdf["mean_do_mgl"].values
-wmc_lon = np.average(coords[:, 0], weights=w)
-wmc_lat = np.average(coords[:, 1], weights=w)
 print(f"Weighted mean center (weight=DO): ({wmc_lon:.4f}, {wmc_lat:.4f})")
 
-# --- Standard distance ---
-dists_deg = np.sqrt(((coords - np.array([mc_lon, mc_lat])) ** 2).sum(axis=1))
-std_dist = np.sqrt(np.mean(dists_deg**2))
-print(f"Standard distance: {std_dist:.4f} degrees")
+# --- Standard distance and deviational ellipse ---
+std_dist_km = mc["std_distance"] / 1000
+print(f"Standard distance: {std_dist_km:.1f} km")
+print(f"Std. deviational ellipse: semi-axes {mc['sigma_major'] / 1000:.1f} x "
+      f"{mc['sigma_minor'] / 1000:.1f} km, major axis at {mc['angle']:.0f}° "
+      "counterclockwise from east")
 
 # --- Interpretation ---
-shift_lon = wmc_lon - mc_lon
-shift_lat = wmc_lat - mc_lat
+shift_east = (wmc["mean_x"] - mc["mean_x"]) / 1000
+shift_north = (wmc["mean_y"] - mc["mean_y"]) / 1000
 print(f"\nShift from unweighted to weighted center:")
-print(f"  Longitude: {shift_lon:+.4f} degrees ({'east' if shift_lon > 0 else 'west'})")
-print(f"  Latitude:  {shift_lat:+.4f} degrees ({'north' if shift_lat > 0 else 'south'})")
+print(f"  Easting:  {shift_east:+.2f} km ({'east' if shift_east > 0 else 'west'})")
+print(f"  Northing: {shift_north:+.2f} km ({'north' if shift_north > 0 else 'south'})")
 print(
     "Interpretation: The weighted center shifts northward because headwater "
     "stations (Susquehanna, Potomac) have higher dissolved oxygen. The southern "
@@ -103,13 +105,13 @@ ax.plot(wmc_lon, wmc_lat, marker="^", color="dodgerblue", markersize=14,
         markeredgecolor="black", markeredgewidth=1, zorder=5,
         label="Weighted Mean Center (DO)")
 
-# Standard distance circle
-circle = Circle(
-    (mc_lon, mc_lat), std_dist,
-    fill=False, edgecolor="gray", linestyle="--", linewidth=1.5,
-    label=f"Std Distance = {std_dist:.2f}\u00b0",
-)
-ax.add_patch(circle)
+# Standard distance circle and deviational ellipse (built in meters, drawn in lon/lat)
+std_circle = centers(unweighted).buffer(mc["std_distance"], quad_segs=32).to_crs(4326)
+std_circle.boundary.plot(ax=ax, color="gray", linestyle="--", linewidth=1.5)
+ax.plot([], [], color="gray", linestyle="--", linewidth=1.5,
+        label=f"Std Distance = {std_dist_km:.0f} km")
+ellipses(unweighted).to_crs(4326).boundary.plot(ax=ax, color="#6a4c93", linewidth=1.5)
+ax.plot([], [], color="#6a4c93", linewidth=1.5, label="Std Deviational Ellipse")
 
 # Arrow from unweighted to weighted center
 ax.annotate(
@@ -136,17 +138,18 @@ print("EXERCISE 2: Nearest Neighbor Analysis")
 print("=" * 70)
 
 # --- Reproject to UTM 18N for distance in meters ---
-stations_utm = stations_gdf.to_crs(epsg=32618)
-coords_utm = np.column_stack([stations_utm.geometry.x, stations_utm.geometry.y])
+# (eds.reproject caches the projected layer: Exercise 1 already made it)
+from eds.reproject import to_crs
 
-# --- Pairwise distance matrix ---
-dmat = cdist(coords_utm, coords_utm)
-np.fill_diagonal(dmat, np.inf)
-print(f"Distance matrix shape: {dmat.shape}")
+stations_utm = to_crs(stations_gdf, UTM_18N)
+coords_utm = np.column_stack([stations_utm.geometry.x, stations_utm.geometry.y])
 
 # --- Nearest neighbor distances ---
-nn_dists = dmat.min(axis=1)
-nn_indices = dmat.argmin(axis=1)
+# A KD-tree query (eds/nni.py) gives the same distances as the full n x n
+# cdist matrix with an inf diagonal, but in linear memory.
+from eds.nni import nearest_neighbors, clark_evans
+
+nn_dists, nn_indices = nearest_neighbors(coords_utm)
 d_obs = nn_dists.mean()
 print(f"\nNearest-neighbor distances (m):")
 for i, (stn, nnd, nni) in enumerate(
@@ -162,28 +165,19 @@ hull = stations_utm.unary_union.convex_hull
 A = hull.area  # m^2
 print(f"Convex hull area: {A/1e6:.1f} km\u00b2")
 
-# --- Expected NN distance under CSR ---
-n = len(stations_utm)
-d_exp = 1 / (2 * np.sqrt(n / A))
+# --- Clark-Evans test: expected NN distance under CSR, NNI, z and p ---
+ce = clark_evans(coords_utm, area=A, nn_dists=nn_dists)
+n = ce["n"]
+d_exp = ce["d_exp"]
+NNI = ce["nni"]
+z = ce["z"]
+p_value = ce["p_value"]
+pattern = ce["pattern"]
 print(f"Expected NN distance (CSR): {d_exp/1000:.2f} km")
-
-# --- NNI ---
-NNI = d_obs / d_exp
 print(f"Nearest Neighbor Index (NNI): {NNI:.4f}")
-
-# --- Z-score ---
-se = 0.26136 / np.sqrt(n**2 / A)
-z = (d_obs - d_exp) / se
-p_value = 2 * (1 - norm.cdf(abs(z)))
 print(f"z-score: {z:.4f}")
 print(f"p-value: {p_value:.4f}")
 
-if NNI < 1:
-    pattern = "CLUSTERED"
-elif NNI > 1:
-    pattern = "DISPERSED"
-else:
-    pattern = "RANDOM"
 sig_str = "significant" if p_value < 0.05 else "not significant"
 print(f"\nConclusion: The monitoring network is {pattern} (NNI={NNI:.2f}, "
       f"z={z:.2f}, p={p_value:.4f}, {sig_str} at alpha=0.05)")
@@ -255,7 +249,7 @@ blooms_gdf = gpd.GeoDataFrame(
     geometry=gpd.points_from_xy(blooms["lon"], blooms["lat"]),
     crs=4326,
 )
-blooms_utm = blooms_gdf.to_crs(epsg=32618)
+blooms_utm = to_crs(blooms_gdf, UTM_18N)
 print(f"Loaded {len(blooms_utm)} algal bloom sightings")
 
 coords_blooms = np.column_stack([blooms_utm.geometry.x, blooms_utm.geometry.y])
@@ -264,26 +258,27 @@ coords_blooms = np.column_stack([blooms_utm.geometry.x, blooms_utm.geometry.y])
 xmin, ymin, xmax, ymax = blooms_utm.total_bounds
 pad = 10000  # 10 km padding
 grid_res = 200  # grid cells per axis
-xx, yy = np.meshgrid(
-    np.linspace(xmin - pad, xmax + pad, grid_res),
-    np.linspace(ymin - pad, ymax + pad, grid_res),
-)
-positions = np.column_stack([xx.ravel(), yy.ravel()])
-
-# --- KDE with bandwidth = 5 km ---
-kde_5k = KernelDensity(bandwidth=5000, kernel="gaussian")
-kde_5k.fit(coords_blooms)
-log_dens_5k = kde_5k.score_samples(positions)
-dens_5k = np.exp(log_dens_5k).reshape(xx.shape)
+grid_x = np.linspace(xmin - pad, xmax + pad, grid_res)
+grid_y = np.linspace(ymin - pad, ymax + pad, grid_res)
+xx, yy = np.meshgrid(grid_x, grid_y)
+
+# --- KDE with bandwidths 5 km and 20 km ---
+# The points are binned onto the grid once and convolved with each Gaussian
+# kernel by FFT (eds/kde.py), instead of evaluating every point at every
+# cell as KernelDensity.score_samples does.
+from eds.kde import kde_grid, kde_error
+
+bandwidths = [5000, 20000]
+dens_5k, dens_20k = kde_grid(coords_blooms, grid_x, grid_y, bandwidths)
 print(f"KDE (5 km): max density = {dens_5k.max():.2e}")
-
-# --- KDE with bandwidth = 20 km ---
-kde_20k = KernelDensity(bandwidth=20000, kernel="gaussian")
-kde_20k.fit(coords_blooms)
-log_dens_20k = kde_20k.score_samples(positions)
-dens_20k = np.exp(log_dens_20k).reshape(xx.shape)
 print(f"KDE (20 km): max density = {dens_20k.max():.2e}")
 
+# Error check against the exact sklearn KernelDensity result
+for bw, dens in zip(bandwidths, (dens_5k, dens_20k)):
+    err = kde_error(coords_blooms, grid_x, grid_y, bw, dens)
+    print(f"  {bw / 1000:.0f} km: max error vs exact KDE = "
+          f"{err['max_rel_error']:.1e} of peak density")
+
 # --- Three-panel figure ---
 fig, axes = plt.subplots(1, 3, figsize=(18, 7))
 
@@ -381,8 +376,14 @@ plt.close()
 print("Saved: ex04_nitrogen_choropleth.png")
 
 # --- Build Queen contiguity spatial weights ---
-w = libpysal.weights.Queen.from_dataframe(ws)
-w.transform = "r"  # row-standardize
+# Contiguity is computed once and cached next to the GeoPackage as a
+# memory-mapped CSR matrix, keyed by a hash of the boundaries
+# (eds/weights.py); Moran's I row-standardizes it.
+from eds.weights import cached_weights
+
+w = cached_weights(ws, kind="queen",
+                   source=os.path.join(SPATIAL_06, "chesapeake_watersheds.gpkg"),
+                   ids=ws["HUC8"])
 
 print(f"\nSpatial weights summary:")
 print(f"  Number of features: {w.n}")
@@ -395,8 +396,13 @@ if w.islands:
     print(f"  WARNING: {len(w.islands)} island(s) detected: {w.islands}")
 
 # --- Global Moran's I ---
+# Permutations run in batches (one sparse product per batch) with a fixed
+# seed so the p-value is reproducible (eds/autocorr.py). With ~100 polygons
+# a process pool is not worth it, so everything stays in this process.
+from eds.autocorr import moran, moran_local
+
 y = ws["nitrogen_kg_ha"].values
-mi = esda.Moran(y, w, permutations=999)
+mi = moran(y, w, permutations=9999, seed=431, workers=1)
 
 print(f"\nGlobal Moran's I Results:")
 print(f"  Moran's I:     {mi.I:.4f}")
@@ -415,7 +421,11 @@ else:
 
 # --- Moran scatter plot ---
 fig, ax = plt.subplots(1, 1, figsize=(7, 7))
-moran_scatterplot(mi, aspect_equal=False, ax=ax)
+ax.scatter(mi.z, mi.lag, s=25, color="steelblue", edgecolor="white", linewidth=0.4)
+z_line = np.array([mi.z.min(), mi.z.max()])
+ax.plot(z_line, mi.I * z_line, color="red", linewidth=1.5)   # slope = Moran's I
+ax.axvline(0, color="gray", linestyle="--", linewidth=0.8)
+ax.axhline(0, color="gray", linestyle="--", linewidth=0.8)
 ax.set_title(f"Moran Scatter Plot — Nitrogen Loading\n"
              f"(I = {mi.I:.4f}, p = {mi.p_sim:.4f})", fontsize=12)
 ax.set_xlabel("Nitrogen (standardized)", fontsize=11)
@@ -441,21 +451,15 @@ print("EXERCISE 5: Local Moran's I (LISA)")
 print("=" * 70)
 
 # --- Compute Local Moran's I ---
-lisa = esda.Moran_Local(y, w, permutations=999)
+lisa = moran_local(y, w, permutations=9999, seed=431, workers=1)
 
 ws["Ii"] = lisa.Is
 ws["p_value"] = lisa.p_sim
 ws["quadrant"] = lisa.q  # 1=HH, 2=LH, 3=LL, 4=HL
 
 # --- Classify clusters ---
-sig = lisa.p_sim < 0.05
-quad_labels = {1: "HH (Hot Spot)", 2: "LH (Low Outlier)",
-               3: "LL (Cold Spot)", 4: "HL (High Outlier)"}
-cluster = np.array(["Not Significant"] * len(ws))
-for i in range(len(ws)):
-    if sig[i]:
-        cluster[i] = quad_labels[lisa.q[i]]
-ws["cluster"] = cluster
+# Quadrant label where p < 0.05, "Not Significant" elsewhere (no loop)
+ws["cluster"] = lisa.labels(alpha=0.05)
 
 print("LISA cluster classification:")
 print(ws["cluster"].value_counts())
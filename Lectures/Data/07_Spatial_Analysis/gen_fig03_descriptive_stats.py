@@ -1,10 +1,16 @@
 """Figure 3: Spatial Descriptive Statistics — Mean Center, Standard Distance, Std. Deviational Ellipse.
 Regenerated WITHOUT colorbar in panel (c).
 """
+import os
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Ellipse
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from eds.centrography import centrography
+
 np.random.seed(42)
 
 # Generate point data with spatial trend
@@ -14,17 +20,13 @@ y = np.random.uniform(1, 11, n)
 # Concentration with spatial trend (higher in lower-left)
 concentration = 10 - 0.15 * x + 0.05 * y + np.random.normal(0, 0.5, n)
 
-# Compute spatial statistics
-mean_x = np.mean(x)
-mean_y = np.mean(y)
-std_dist = np.sqrt(np.mean((x - mean_x) ** 2 + (y - mean_y) ** 2))
-
-# Covariance for ellipse
-cov = np.cov(x, y)
-eigenvalues, eigenvectors = np.linalg.eigh(cov)
-angle = np.degrees(np.arctan2(eigenvectors[1, 1], eigenvectors[0, 1]))
-ellipse_width = 2 * np.sqrt(eigenvalues[1])
-ellipse_height = 2 * np.sqrt(eigenvalues[0])
+# Compute spatial statistics (mean center, standard distance, ellipse)
+stats = centrography(x, y).iloc[0]
+mean_x, mean_y = stats["mean_x"], stats["mean_y"]
+std_dist = stats["std_distance"]
+angle = stats["angle"]
+ellipse_width = 2 * stats["sigma_major"]
+ellipse_height = 2 * stats["sigma_minor"]
 
 fig, axes = plt.subplots(1, 3, figsize=(15, 5))
 cmap = "YlOrRd"
@@ -76,7 +78,7 @@ ax = axes[2]
 ax.scatter(x, y, **scatter_kw)
 ax.plot(mean_x, mean_y, "k+", markersize=15, mew=3)
 ellipse = Ellipse(
-    (mean_x, mean_y), ellipse_width * 2, ellipse_height * 2, angle=angle,
+    (mean_x, mean_y), ellipse_width, ellipse_height, angle=angle,
     fill=False, color="#6a4c93", linestyle="--", linewidth=2,
 )
 ax.add_patch(ellipse)
@@ -1,9 +1,15 @@
 """Figure 7: IDW — Effect of the Power Parameter.
 Regenerated with colorbar on the RIGHT SIDE of the figure (outside the panels).
 """
+import os
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from eds.idw import idw
+
 np.random.seed(42)
 
 # Station locations and temperatures
@@ -16,24 +22,12 @@ grid_x = np.linspace(0, 10, 200)
 grid_y = np.linspace(0, 10, 200)
 GX, GY = np.meshgrid(grid_x, grid_y)
 
-
-def idw(x, y, values, xi, yi, power):
-    """Inverse Distance Weighting interpolation."""
-    result = np.zeros_like(xi)
-    for i in range(xi.shape[0]):
-        for j in range(xi.shape[1]):
-            dist = np.sqrt((x - xi[i, j]) ** 2 + (y - yi[i, j]) ** 2)
-            dist = np.maximum(dist, 1e-10)
-            weights = 1.0 / dist ** power
-            result[i, j] = np.sum(weights * values) / np.sum(weights)
-    return result
-
-
 powers = [1, 2, 5]
 labels = ["(a) Power = 1 (smooth)", "(b) Power = 2 (standard)", "(c) Power = 5 (local)"]
 
-# Compute all interpolations first to get consistent color limits
-all_Z = [idw(stations_x, stations_y, temperatures, GX, GY, p) for p in powers]
+# Compute all interpolations first (one pass over the distances for all three
+# powers) to get consistent color limits
+all_Z = list(idw(stations_x, stations_y, temperatures, GX, GY, power=powers))
 vmin = min(Z.min() for Z in all_Z)
 vmax = max(Z.max() for Z in all_Z)
 
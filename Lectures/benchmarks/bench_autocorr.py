@@ -0,0 +1,57 @@
+"""Benchmark: local Moran's I with a high-cardinality weights matrix.
+
+Builds a k-nearest-neighbor W on random points with a large k (a
+distance-band-like W), checks that the neighbor sampler returns distinct
+positions in every row for both the rejection and the shuffle regimes,
+and times ``moran_local``.
+
+Run with: python benchmarks/bench_autocorr.py [n] [k]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+LECTURES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, LECTURES_DIR)
+from eds.autocorr import _sample_without_replacement, moran_local
+
+
+def knn_weights(xy, k):
+    """Binary k-nearest-neighbor weights (self excluded) as CSR."""
+    _, idx = cKDTree(xy).query(xy, k=k + 1)
+    rows = np.repeat(np.arange(len(xy)), k)
+    return sparse.csr_matrix((np.ones(rows.size), (rows, idx[:, 1:].ravel())),
+                             shape=(len(xy), len(xy)))
+
+
+def check_sampler(n, seed=0):
+    rng = np.random.default_rng(seed)
+    for k in (1, int(np.sqrt(n)), int(np.sqrt(n)) + 1, n // 4, n):
+        draws = _sample_without_replacement(rng, n, k, 20)
+        ordered = np.sort(draws, axis=1)
+        assert draws.shape == (20, k)
+        assert (ordered[:, 1:] != ordered[:, :-1]).all(), f"duplicates for k={k}"
+        assert draws.min() >= 0 and draws.max() < n
+
+
+def main(n=10_000, k=2_500):
+    check_sampler(n - 1)
+    rng = np.random.default_rng(42)
+    xy = rng.uniform(0, 1, (n, 2))
+    y = xy[:, 0] + rng.normal(0, 0.5, n)
+    W = knn_weights(xy, k)
+    print(f"n = {n:,}, neighbors per row = {k:,}, nnz = {W.nnz:,}")
+
+    start = time.perf_counter()
+    result = moran_local(y, W, permutations=99, seed=1, workers=1)
+    elapsed = time.perf_counter() - start
+    assert np.isfinite(result.p_sim).all()
+    print(f"moran_local (99 permutations): {elapsed:8.3f} s")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
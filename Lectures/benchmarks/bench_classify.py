@@ -0,0 +1,73 @@
+"""Benchmark: row-wise df.apply(classify) vs the array classifier.
+
+Builds a synthetic sensor archive by resampling water_quality.csv, checks
+that both paths give identical labels, and prints timings.
+
+Run with: python benchmarks/bench_classify.py [n_rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+LECTURES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, LECTURES_DIR)
+from eds.classify import classify_water_quality, classify_water_quality_array
+
+CSV_PATH = os.path.join(LECTURES_DIR, "Data", "02_Algorithms", "water_quality.csv")
+
+
+def classify_reference(do_val, temp, hypoxic_threshold=2.0, stress_threshold=5.0):
+    """The original scalar if/elif classifier from Lecture 2 Exercise 9."""
+    if pd.isna(do_val) or pd.isna(temp):
+        return "Unknown"
+    if do_val < hypoxic_threshold:
+        return "Critical"
+    if do_val < stress_threshold:
+        return "Stressed"
+    if temp > 28:
+        return "Heat Stress"
+    return "Good"
+
+
+def make_archive(n_rows, seed=42):
+    """Resample the real readings (NaNs included) up to n_rows rows."""
+    df = pd.read_csv(CSV_PATH, na_values=["-999", "-9999"])
+    rng = np.random.default_rng(seed)
+    return df.iloc[rng.integers(0, len(df), n_rows)].reset_index(drop=True)
+
+
+def time_it(func, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(n_rows=200_000):
+    df = make_archive(n_rows)
+    print(f"Rows: {len(df):,}")
+
+    t_apply, by_row = time_it(lambda: df.apply(
+        lambda r: classify_reference(r["do_mg_l"], r["temp_c"]), axis=1
+    ), repeat=1)
+    t_array, by_array = time_it(lambda: classify_water_quality_array(
+        df["do_mg_l"], df["temp_c"]
+    ))
+
+    assert (by_row.astype(str) == by_array.astype(str)).all()
+    sample = df.head(1000)
+    assert all(classify_water_quality(d, t) == classify_reference(d, t)
+               for d, t in zip(sample["do_mg_l"], sample["temp_c"]))
+    print(f"df.apply (row-wise) : {t_apply:8.3f} s")
+    print(f"array classifier    : {t_array:8.3f} s")
+    print(f"Speed-up            : {t_apply / t_array:8.0f}x")
+    print(by_array.value_counts().to_string())
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,100 @@
+"""Benchmark: point-in-polygon against large zones, cut into small pieces.
+
+Builds nested buffer zones around random streams, indexes them with
+``PolygonIndex`` (cut into small pieces) and checks the answers against
+``contains_xy`` on the uncut zones for random points, for points on the
+quadrant cut lines (inside) and for zone vertices (on the boundary, not
+inside). The same checks run on tile pieces, as from
+``buffer_union(..., dissolve=False)``. Prints timings.
+
+Run with: python benchmarks/bench_containment.py [n_points]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import shapely
+
+LECTURES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, LECTURES_DIR)
+from eds.containment import PolygonIndex
+
+
+def make_zones(n_lines=300, distances=(100, 300, 500), seed=0):
+    """Buffers of random 10-vertex lines in a 50 km square, one per distance."""
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(0, 50_000, (n_lines, 1, 2))
+    lines = shapely.linestrings(start + np.cumsum(rng.normal(0, 400, (n_lines, 10, 2)), axis=1))
+    return np.array([shapely.union_all(shapely.buffer(lines, d)) for d in distances])
+
+
+def tile_pieces(zone, n_tiles=8):
+    """``zone`` clipped to an n x n grid of tiles, as one GeometryCollection."""
+    x0, y0, x1, y1 = shapely.bounds(zone)
+    xs, ys = np.linspace(x0, x1, n_tiles + 1), np.linspace(y0, y1, n_tiles + 1)
+    return shapely.geometrycollections([
+        shapely.clip_by_rect(zone, xs[i], ys[j], xs[i + 1], ys[j + 1])
+        for i in range(n_tiles) for j in range(n_tiles)])
+
+
+def cut_line_points(index, zones, per_piece=8):
+    """Points on piece edges that are not on the boundary of their zone."""
+    rings = shapely.get_exterior_ring(index.pieces)
+    fractions = np.linspace(0, 1, per_piece, endpoint=False) + 0.5 / per_piece
+    pts = shapely.line_interpolate_point(rings[:, None], fractions[None, :], normalized=True)
+    owner = np.repeat(index.owner, per_piece)
+    pts = pts.ravel()
+    away = shapely.distance(shapely.boundary(zones)[owner], pts) > 1e-3
+    return pts[away]
+
+
+def reference_pairs(zones, x, y):
+    pairs = [(p, z) for z, zone in enumerate(zones)
+             for p in np.flatnonzero(shapely.contains_xy(zone, x, y))]
+    return np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+
+
+def check(index, zones, x, y, label):
+    p_idx, z_idx = index.query(np.column_stack([x, y]))
+    expected = reference_pairs(zones, x, y)
+    assert np.array_equal(np.column_stack([p_idx, z_idx]), expected), label
+
+
+def main(n_points=200_000):
+    zones = make_zones()
+    for zone in zones:
+        shapely.prepare(zone)
+
+    for label, polygons in (("quadrant pieces", zones),
+                            ("tile pieces", np.array([tile_pieces(z) for z in zones]))):
+        index = PolygonIndex(polygons, max_vertices=64)
+        on_cut = cut_line_points(index, zones)
+        assert len(on_cut), "no cut-line points"
+        vertices = shapely.get_coordinates(shapely.boundary(zones))[::50]
+        check(index, zones, shapely.get_x(on_cut), shapely.get_y(on_cut),
+              f"{label}: cut-line points")
+        assert index.contains(on_cut).all(), f"{label}: cut-line points"
+        check(index, zones, vertices[:, 0], vertices[:, 1], f"{label}: boundary points")
+        expected = np.any([shapely.contains_xy(z, vertices[:, 0], vertices[:, 1])
+                           for z in zones], axis=0)
+        assert np.array_equal(index.contains(vertices), expected), f"{label}: boundary points"
+        print(f"{label}: {len(index):,} pieces, {len(on_cut):,} cut-line and "
+              f"{len(vertices):,} boundary points checked")
+
+    rng = np.random.default_rng(1)
+    x, y = rng.uniform(-1_000, 51_000, (2, n_points))
+    index = PolygonIndex(zones)
+    check(index, zones, x, y, "random points")
+    start = time.perf_counter()
+    index.query(np.column_stack([x, y]))
+    elapsed_index = time.perf_counter() - start
+    start = time.perf_counter()
+    reference_pairs(zones, x, y)
+    elapsed_ref = time.perf_counter() - start
+    print(f"{n_points:,} points x {len(zones)} zones: PolygonIndex {elapsed_index:.3f} s, "
+          f"prepared contains_xy on the whole zones {elapsed_ref:.3f} s")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
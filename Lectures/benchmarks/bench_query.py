@@ -0,0 +1,105 @@
+"""Benchmark: Exercise 4 boolean-mask filtering vs WaterQualityIndex.
+
+Builds a synthetic hourly sonde archive (50 stations, seasonal temperature,
+DO inversely related to temperature, sentinel-style gaps), checks that the
+indexed queries return exactly the mask answers, and prints timings.
+
+Run with: python benchmarks/bench_query.py [n_rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+LECTURES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, LECTURES_DIR)
+from eds.wq_query import WaterQualityIndex
+
+
+def make_archive(n_rows, n_stations=50, seed=42):
+    """Hourly readings per station, rows shuffled like a merged feed."""
+    rng = np.random.default_rng(seed)
+    per_station = -(-n_rows // n_stations)
+    hours = np.tile(np.arange(per_station), n_stations)[:n_rows]
+    station = np.repeat(np.arange(n_stations), per_station)[:n_rows]
+    date = np.datetime64("2000-01-01T00", "h") + hours
+    season = np.sin(2 * np.pi * (hours / 24 - 100) / 365.25)
+    temp = 15 + 12 * season + rng.normal(0, 1.5, n_rows)
+    do = 9 - 0.25 * (temp - 15) + rng.normal(0, 1.0, n_rows)
+    turb = rng.lognormal(1.5, 0.6, n_rows)
+    for arr in (temp, do, turb):
+        arr[rng.random(n_rows) < 0.02] = np.nan
+    df = pd.DataFrame({
+        "station": pd.Categorical.from_codes(
+            station, [f"CB-{i // 10}.{i % 10}" for i in range(n_stations)]),
+        "date": date.astype("datetime64[ns]"),
+        "temp_c": temp,
+        "do_mg_l": do,
+        "turbidity_ntu": turb,
+    })
+    return df.iloc[rng.permutation(n_rows)].reset_index(drop=True)
+
+
+def time_it(func, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def fisheries_mask(df, day):
+    sub = df[(df["date"] >= day) & (df["date"] <= day + pd.Timedelta(hours=23))]
+    cond = ((sub["do_mg_l"] < 6.0) | (sub["turbidity_ntu"] > 15)).fillna(False)
+    return sub[cond]
+
+
+def researcher_mask(df, stations):
+    sub = df[df["station"].isin(stations)]
+    sub = sub[(sub["temp_c"] >= 24) & (sub["temp_c"] <= 26)]
+    return sub[sub["do_mg_l"].notna()]
+
+
+def heat_mask(df, threshold):
+    return df[df["temp_c"] > threshold]
+
+
+def main(n_rows=10_000_000):
+    df = make_archive(n_rows)
+    print(f"Rows: {len(df):,}")
+    t_build, index = time_it(lambda: WaterQualityIndex(df), repeat=1)
+    print(f"Index build          : {t_build:8.3f} s")
+
+    day = df["date"].iloc[0].normalize()
+    stations = ["CB-0.1", "CB-2.3"]
+    cases = [
+        ("day + DO/turbidity OR",
+         lambda: fisheries_mask(df, day),
+         lambda: index.query(start=day, end=day + pd.Timedelta(hours=23),
+                             any_of=[("do_mg_l", "<", 6.0), ("turbidity_ntu", ">", 15)])),
+        ("station isin + temp range",
+         lambda: researcher_mask(df, stations),
+         lambda: index.query(stations=stations, where=[("temp_c", "between", (24, 26))],
+                             notna=["do_mg_l"])),
+        ("temp > 29.5 (zone maps)",
+         lambda: heat_mask(df, 29.5),
+         lambda: index.query(where=[("temp_c", ">", 29.5)])),
+        ("temp > 31.5 (zone maps)",
+         lambda: heat_mask(df, 31.5),
+         lambda: index.query(where=[("temp_c", ">", 31.5)])),
+    ]
+    # Zone maps only pay off when few blocks can match: a dense threshold
+    # touches most blocks and is no faster than one contiguous scan.
+    for name, by_mask, by_index in cases:
+        t_mask, expected = time_it(by_mask)
+        t_index, got = time_it(by_index)
+        pd.testing.assert_frame_equal(got, expected)
+        print(f"{name:26s}: mask {t_mask:8.4f} s | index {t_index:8.4f} s | "
+              f"{t_mask / t_index:6.0f}x | {len(got):,} rows")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000)
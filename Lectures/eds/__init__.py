@@ -0,0 +1,5 @@
+"""Shared helpers for the ENST431/631 exercise solutions and figure scripts.
+
+Each module is self-contained and imports only what it needs, so loading one
+helper does not pull in the whole geospatial stack.
+"""
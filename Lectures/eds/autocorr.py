@@ -0,0 +1,292 @@
+"""Global and Local Moran's I with batched, parallel permutation inference.
+
+``esda.Moran`` and ``esda.Moran_Local`` run their permutations one at a
+time on a single core. Here the permutations are done in batches:
+
+- global Moran's I: a batch of permuted ``z`` vectors is stacked into an
+  ``(n, batch)`` matrix and lagged with one sparse product ``W @ Z``;
+- local Moran's I: each observation keeps its own value and draws random
+  neighbors from the other ``n - 1`` (conditional randomization). A batch
+  is one gather per neighbor-count group, so memory scales with the number
+  of weights (nnz) rather than ``n x max_neighbors``.
+
+Permutations are split into fixed-size tasks. Each task gets its own child
+of ``np.random.SeedSequence(seed)`` and can run in a process pool
+(``workers``). The result depends only on ``seed``, not on the number of
+workers. The default is ``workers=1``: the pool uses the "fork" start
+method, which is only safe before threads (BLAS, GUI toolkits) have
+started, so use it for large ``n`` from a plain script. Where fork is
+unavailable (Windows) the tasks run in the calling process with a
+``RuntimeWarning``. The local statistics are streamed (exceedance counts,
+sums), so 9,999+ permutations never hold an ``n x permutations`` matrix.
+
+The statistics follow esda's definitions (row-standardized weights,
+``p_sim`` folded to the smaller tail, quadrants 1=HH, 2=LH, 3=LL, 4=HL).
+The one deliberate difference is that observations without neighbors get
+``p_sim = 1`` (never significant).
+"""
+
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+PERMUTATIONS = 999
+TASK_SIZE = 500              # permutations per task (fixed for reproducibility)
+MAX_BATCH_ELEMENTS = 2**22   # values held per batch inside a task
+
+LISA_LABELS = ["Not Significant", "HH (Hot Spot)", "LH (Low Outlier)",
+               "LL (Cold Spot)", "HL (High Outlier)"]
+
+
+class MoranResult:
+    """Global Moran's I (attribute names as in ``esda.Moran``)."""
+
+    def __init__(self, I, EI, sim, z, lag):
+        self.I = I
+        self.EI = EI
+        self.sim = sim
+        self.permutations = len(sim)
+        self.z = z          # standardized values
+        self.lag = lag      # spatial lag of z
+        if len(sim):
+            larger = int((sim >= I).sum())
+            larger = min(larger, self.permutations - larger)
+            self.p_sim = (larger + 1.0) / (self.permutations + 1.0)
+            self.EI_sim = sim.mean()
+            self.seI_sim = sim.std()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.z_sim = (I - self.EI_sim) / self.seI_sim
+        else:
+            self.p_sim = self.EI_sim = self.seI_sim = self.z_sim = np.nan
+
+
+class LocalMoranResult:
+    """Local Moran's I (attribute names as in ``esda.Moran_Local``)."""
+
+    def __init__(self, Is, q, z, lag, permutations, larger, sim_sum, sim_sumsq,
+                 islands):
+        self.Is = Is
+        self.q = q
+        self.z = z
+        self.lag = lag
+        self.permutations = permutations
+        if permutations:
+            larger = np.minimum(larger, permutations - larger)
+            self.p_sim = (larger + 1.0) / (permutations + 1.0)
+            self.p_sim[islands] = 1.0
+            # sums are of (sim - Is), which keeps the variance well conditioned
+            mean_dev = sim_sum / permutations
+            self.EI_sim = Is + mean_dev
+            self.seI_sim = np.sqrt(np.maximum(sim_sumsq / permutations - mean_dev ** 2, 0))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.z_sim = (Is - self.EI_sim) / self.seI_sim
+        else:
+            self.p_sim = self.EI_sim = self.seI_sim = self.z_sim = np.full(len(Is), np.nan)
+
+    def labels(self, alpha=0.05):
+        return lisa_labels(self.q, self.p_sim, alpha)
+
+
+def sparse_weights(w, transform="r"):
+    """CSR weights from a libpysal ``W``, ``eds.weights.SpatialWeights`` or
+    any scipy sparse matrix.
+
+    ``transform="r"`` row-standardizes (rows without neighbors stay zero);
+    ``None`` keeps the weights as given. Cached ``SpatialWeights`` already
+    hold both matrices and are returned without a copy.
+    """
+    if hasattr(w, "sparse_r") and transform in ("r", None):
+        return w.sparse_r if transform == "r" else w.sparse
+    matrix = w.sparse if hasattr(w, "sparse") else w
+    matrix = sparse.csr_matrix(matrix, dtype=float)
+    if transform == "r":
+        row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+        scale = np.divide(1.0, row_sums, out=np.zeros_like(row_sums), where=row_sums != 0)
+        matrix = sparse.diags(scale) @ matrix
+    elif transform is not None:
+        raise ValueError(f"unsupported transform: {transform!r}")
+    return matrix.tocsr()
+
+
+def moran(y, w, permutations=PERMUTATIONS, seed=None, workers=1, transform="r"):
+    """Global Moran's I of ``y`` with a permutation test.
+
+    ``w`` is a libpysal ``W`` or a sparse matrix; ``seed`` makes the
+    permutations reproducible; ``workers`` is the process count (``None``
+    for all cores, 1 to stay in this process).
+    """
+    y = np.asarray(y, dtype=float).ravel()
+    W = sparse_weights(w, transform)
+    n = len(y)
+    _check_shapes(W, n)
+    z = y - y.mean()
+    I = n / W.sum() * (z @ (W @ z)) / (z @ z)
+    sims = _run_tasks(_global_task, (W, z), permutations, seed, workers)
+    sim = np.concatenate(sims) if sims else np.array([])
+    zs = z / y.std()
+    return MoranResult(I, -1.0 / (n - 1), sim, zs, W @ zs)
+
+
+def moran_local(y, w, permutations=PERMUTATIONS, seed=None, workers=1, transform="r"):
+    """Local Moran's I (LISA) of ``y`` with conditional permutation tests.
+
+    Arguments as for ``moran``. ``result.labels(alpha)`` gives the cluster
+    labels.
+    """
+    y = np.asarray(y, dtype=float).ravel()
+    W = sparse_weights(w, transform)
+    n = len(y)
+    _check_shapes(W, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (y - y.mean()) / y.std()
+    lag = W @ z
+    scaling = (n - 1) / (z @ z)
+    Is = scaling * z * lag
+
+    islands = np.diff(W.indptr) == 0
+    args = (z, Is, scaling) + _neighbor_groups(W)
+    parts = _run_tasks(_local_task, args, permutations, seed, workers)
+    larger = sum(p[0] for p in parts) if parts else np.zeros(n)
+    sim_sum = sum(p[1] for p in parts) if parts else np.zeros(n)
+    sim_sumsq = sum(p[2] for p in parts) if parts else np.zeros(n)
+    return LocalMoranResult(Is, quadrants(z, lag), z, lag, permutations,
+                            larger, sim_sum, sim_sumsq, islands)
+
+
+def quadrants(z, lag):
+    """Moran scatterplot quadrant: 1=HH, 2=LH, 3=LL, 4=HL (zero counts as low)."""
+    high = np.asarray(z) > 0
+    high_lag = np.asarray(lag) > 0
+    return np.where(high, np.where(high_lag, 1, 4), np.where(high_lag, 2, 3))
+
+
+def lisa_labels(q, p_sim, alpha=0.05):
+    """Cluster label per observation (``LISA_LABELS``) from quadrant and p-value."""
+    codes = np.where(np.asarray(p_sim) < alpha, q, 0)
+    return np.asarray(LISA_LABELS, dtype=object)[codes]
+
+
+def _check_shapes(W, n):
+    if W.shape != (n, n):
+        raise ValueError(f"weights are {W.shape}, expected ({n}, {n})")
+
+
+# --- permutation tasks -------------------------------------------------------
+
+def _run_tasks(task, args, permutations, seed, workers):
+    """Split ``permutations`` into seeded tasks and run them (in parallel)."""
+    if not permutations:
+        return []
+    sizes = [TASK_SIZE] * (permutations // TASK_SIZE)
+    if permutations % TASK_SIZE:
+        sizes.append(permutations % TASK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    workers = workers or os.cpu_count()
+    if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+        warnings.warn("the 'fork' start method is unavailable; running the "
+                      "permutations in this process (workers=1)", RuntimeWarning,
+                      stacklevel=3)
+        workers = 1
+    if workers == 1 or len(sizes) == 1:
+        _init_worker(args)
+        return [task(s, size) for s, size in zip(seeds, sizes)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(sizes)),
+                             mp_context=multiprocessing.get_context("fork"),
+                             initializer=_init_worker, initargs=(args,)) as pool:
+        return list(pool.map(task, seeds, sizes))
+
+
+_ARGS = None
+
+
+def _init_worker(args):
+    global _ARGS
+    _ARGS = args
+
+
+def _global_task(seed, n_perm):
+    W, z = _ARGS
+    rng = np.random.default_rng(seed)
+    n = len(z)
+    scale = n / W.sum() / (z @ z)
+    batch = max(1, MAX_BATCH_ELEMENTS // n)
+    out = []
+    for start in range(0, n_perm, batch):
+        b = min(batch, n_perm - start)
+        perms = rng.permuted(np.tile(np.arange(n), (b, 1)), axis=1)
+        Z = z[perms].T                                  # (n, b)
+        out.append(scale * np.einsum("ij,ij->j", Z, W @ Z))
+    return np.concatenate(out)
+
+
+def _neighbor_groups(W):
+    """Split W into self-weights and (rows, weights) blocks by neighbor count."""
+    self_w = W.diagonal()
+    off = (W - sparse.diags(self_w)).tocsr()
+    off.eliminate_zeros()
+    card = np.diff(off.indptr)
+    groups = []
+    for c in np.unique(card[card > 0]):
+        rows = np.flatnonzero(card == c)
+        ptr = off.indptr[rows][:, None] + np.arange(c)
+        groups.append((rows, off.data[ptr]))
+    max_card = int(card.max()) if len(card) else 0
+    return self_w, groups, max_card, card == 0
+
+
+def _local_task(seed, n_perm):
+    """Exceedance counts and (sim - Is) sums for ``n_perm`` permutations."""
+    z, Is, scaling, self_w, groups, max_card, no_neighbors = _ARGS
+    rng = np.random.default_rng(seed)
+    n = len(z)
+    nnz = sum(w.size for _, w in groups)
+
+    larger = np.zeros(n)
+    sim_sum = np.zeros(n)
+    sim_sumsq = np.zeros(n)
+    batch = max(1, MAX_BATCH_ELEMENTS // max(nnz, 1))
+    for start in range(0, n_perm, batch):
+        b = min(batch, n_perm - start)
+        # One sample of max_card positions among the n - 1 "others" per
+        # permutation, shared by all observations (as in esda's crand)
+        draws = _sample_without_replacement(rng, n - 1, max_card, b)
+        for rows, weights in groups:
+            c = weights.shape[1]
+            r = draws[None, :, :c]                      # (1, b, c)
+            idx = r + (r >= rows[:, None, None])        # skip the row itself
+            lag = np.einsum("ibk,ik->ib", z[idx], weights)
+            zi = z[rows][:, None]
+            sim = scaling * zi * (lag + self_w[rows][:, None] * zi)
+            dev = sim - Is[rows][:, None]
+            larger[rows] += (sim >= Is[rows][:, None]).sum(axis=1)
+            sim_sum[rows] += dev.sum(axis=1)
+            sim_sumsq[rows] += (dev * dev).sum(axis=1)
+    # Observations without neighbors always simulate their observed value
+    iso = no_neighbors
+    larger[iso] += n_perm * (scaling * z[iso] ** 2 * self_w[iso] >= Is[iso])
+    return larger, sim_sum, sim_sumsq
+
+
+def _sample_without_replacement(rng, n, k, size):
+    """``size`` rows of ``k`` distinct integers from ``range(n)``.
+
+    Rejection sampling redraws a row with probability about
+    ``1 - exp(-k**2 / 2n)``, so it is used only while ``k * k <= n``;
+    larger neighbor counts shuffle ``range(n)`` per row instead.
+    """
+    if k == 0:
+        return np.zeros((size, 0), dtype=np.int64)
+    if k * k > n:
+        return rng.permuted(np.tile(np.arange(n), (size, 1)), axis=1)[:, :k]
+    draws = rng.integers(0, n, size=(size, k))
+    while True:
+        ordered = np.sort(draws, axis=1)
+        dup = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        if not dup.any():
+            return draws
+        draws[dup] = rng.integers(0, n, size=(int(dup.sum()), k))
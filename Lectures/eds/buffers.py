@@ -0,0 +1,154 @@
+"""Dissolved multi-distance buffers of a large line network, tile by tile.
+
+Lecture 6 Exercise 6 buffers every stream at 100, 300 and 500 m and then
+calls ``unary_union`` on the whole network once per distance, so every
+union overlays all 7,000+ buffers at once. ``buffer_union`` instead cuts
+the extent into square tiles and, per tile (in a thread pool; GEOS
+releases the GIL):
+
+1. selects the lines within the largest distance of the tile (STRtree);
+2. buffers them at the smallest distance and dissolves them;
+3. grows that polygon to each larger distance by the difference
+   (``buffer(buffer(L, 100), 200)`` is the 300 m buffer of ``L``), so the
+   raw lines are buffered only once;
+4. clips every result to the tile.
+
+The clipped pieces of different tiles do not overlap, so the dissolved
+area per distance is simply the sum of the piece areas, and the pieces are
+stitched into one geometry by unioning only the polygons that reach a tile
+edge. The work per tile is bounded, so the cost grows with the
+number of lines (e.g. the NHD high-resolution network) instead of with the
+size of one global union.
+
+Step 3 is exact for true (round) buffers. With polygonal arcs the result
+differs from buffering the lines directly by less than the arc chord error
+of ``quad_segs`` (dissolved areas agree to ~0.1%); pass ``nested=False`` to
+buffer the lines at every distance instead.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import shapely
+
+FEATURES_PER_TILE = 500
+
+
+def buffer_union(geoms, distances, tile_size=None, workers=None, nested=True,
+                 quad_segs=16, dissolve=True):
+    """Dissolved buffers of ``geoms`` at each of ``distances``.
+
+    Parameters
+    ----------
+    geoms : geopandas.GeoSeries or GeoDataFrame
+        Lines (or any geometries) in a projected CRS; distances are in its
+        units (meters for UTM).
+    distances : sequence of float
+        Buffer distances, e.g. ``[100, 300, 500]``.
+    tile_size : float, optional
+        Tile edge length in CRS units. By default tiles hold about
+        ``FEATURES_PER_TILE`` features on average.
+    workers : int, optional
+        Threads for the per-tile work (default: all cores).
+    nested : bool
+        Grow each distance from the previous one (see module docstring)
+        instead of buffering the lines again.
+    quad_segs : int
+        Segments per quarter circle (the ``GeoSeries.buffer`` default).
+    dissolve : bool
+        Stitch the tile pieces into one geometry per distance. With
+        ``False`` the geometry column holds a GeometryCollection of the
+        pieces, which is enough for plotting and for the areas.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        One row per distance (ascending) with ``buffer_distance``, ``area_km2``
+        and the buffer ``geometry``, in the CRS of ``geoms``.
+    """
+    import geopandas as gpd
+    from pyproj import CRS
+
+    crs = getattr(geoms, "crs", None)
+    if crs is not None and CRS.from_user_input(crs).is_geographic:
+        raise ValueError("buffer in a projected CRS (meters), "
+                         "e.g. geoms.to_crs('EPSG:32618')")
+    distances = np.unique(np.asarray(distances, dtype=float))
+    if len(distances) == 0 or distances[0] <= 0:
+        raise ValueError("distances must be positive")
+
+    geoms = np.asarray(getattr(geoms, "geometry", geoms))
+    geoms = geoms[~(shapely.is_missing(geoms) | shapely.is_empty(geoms))]
+    tiles = tile_grid(geoms, distances[-1], tile_size)
+    tree = shapely.STRtree(geoms)
+    reach = shapely.buffer(tiles, distances[-1], quad_segs=1, join_style="mitre")
+    tile_idx, geom_idx = tree.query(reach)
+    members = np.split(geom_idx, np.flatnonzero(np.diff(tile_idx)) + 1)
+    tile_ids = np.unique(tile_idx)
+
+    def run(i):
+        return _tile_buffers(geoms[members[i]], tiles[tile_ids[i]], distances,
+                             nested, quad_segs)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        pieces = np.array(list(pool.map(run, range(len(tile_ids)))), dtype=object)
+    pieces = pieces.reshape(len(tile_ids), len(distances))
+
+    areas = shapely.area(pieces).sum(axis=0) / 1e6
+    if dissolve:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            rects = shapely.bounds(tiles[tile_ids])
+            merged = list(pool.map(lambda j: _stitch(pieces[:, j], rects),
+                                   range(len(distances))))
+    else:
+        merged = [shapely.geometrycollections(pieces[:, j]) for j in range(len(distances))]
+
+    return gpd.GeoDataFrame({"buffer_distance": distances, "area_km2": areas},
+                            geometry=merged, crs=crs)
+
+
+def tile_grid(geoms, margin=0.0, tile_size=None):
+    """Square tile polygons covering the extent of ``geoms`` plus ``margin``."""
+    if len(geoms) == 0:
+        return np.array([], dtype=object)
+    x0, y0, x1, y1 = shapely.total_bounds(geoms)
+    x0, y0, x1, y1 = x0 - margin, y0 - margin, x1 + margin, y1 + margin
+    if tile_size is None:
+        per_axis = max(1, int(np.ceil(np.sqrt(len(geoms) / FEATURES_PER_TILE))))
+        tile_size = max(x1 - x0, y1 - y0) / per_axis
+    nx = max(1, int(np.ceil((x1 - x0) / tile_size)))
+    ny = max(1, int(np.ceil((y1 - y0) / tile_size)))
+    gx = x0 + tile_size * np.arange(nx)
+    gy = y0 + tile_size * np.arange(ny)
+    xmin, ymin = (a.ravel() for a in np.meshgrid(gx, gy))
+    return shapely.box(xmin, ymin, xmin + tile_size, ymin + tile_size)
+
+
+def _tile_buffers(lines, tile, distances, nested, quad_segs):
+    """Buffers of ``lines`` at every distance, clipped to ``tile``."""
+    rect = shapely.bounds(tile)
+    if nested:
+        grown = [shapely.union_all(shapely.buffer(lines, distances[0],
+                                                  quad_segs=quad_segs))]
+        for step in np.diff(distances):
+            grown.append(shapely.buffer(grown[-1], step, quad_segs=quad_segs))
+    else:
+        grown = [shapely.union_all(shapely.buffer(lines, d, quad_segs=quad_segs))
+                 for d in distances]
+    return [shapely.clip_by_rect(g, *rect) for g in grown]
+
+
+def _stitch(pieces, rects):
+    """One geometry from the non-overlapping tile pieces of one distance.
+
+    Only polygons that reach an edge of their tile can continue into a
+    neighbour; those are unioned, the rest are already final.
+    """
+    parts, owner = shapely.get_parts(pieces, return_index=True)
+    polygonal = shapely.get_type_id(parts) == 3     # drop line/point slivers
+    parts, owner = parts[polygonal], owner[polygonal]
+    tol = 1e-9 * np.abs(rects).max()
+    on_edge = (np.abs(shapely.bounds(parts) - rects[owner]) <= tol).any(axis=1)
+    joined = shapely.get_parts(shapely.union_all(parts[on_edge]))
+    return shapely.multipolygons(np.concatenate([parts[~on_edge], joined]))
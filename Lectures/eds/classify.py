@@ -0,0 +1,52 @@
+"""Water-quality classification (Lecture 2 Exercise 9) for whole columns.
+
+``classify_water_quality_array`` applies the same rules as the scalar
+``classify_water_quality`` to entire arrays at once with ``np.select``, and
+returns a categorical column instead of one Python string per row:
+
+- Unknown      DO or temperature missing
+- Critical     DO < hypoxic_threshold
+- Stressed     DO < stress_threshold
+- Heat Stress  temperature > heat_threshold
+- Good         everything else
+
+The rules are checked in that order, exactly like the ``if/elif`` chain.
+"""
+
+import numpy as np
+import pandas as pd
+
+WQ_CLASSES = ["Critical", "Stressed", "Heat Stress", "Good", "Unknown"]
+_CRITICAL, _STRESSED, _HEAT, _GOOD, _UNKNOWN = range(len(WQ_CLASSES))
+
+
+def classify_water_quality_array(do, temp, hypoxic_threshold=2.0,
+                                 stress_threshold=5.0, heat_threshold=28.0):
+    """Classify arrays of DO and temperature readings.
+
+    Returns a ``pd.Series`` of dtype ``category`` (aligned to ``do``'s index
+    when ``do`` is a Series), otherwise a ``pd.Categorical``.
+    """
+    do_arr = np.asarray(do, dtype=float)
+    temp_arr = np.asarray(temp, dtype=float)
+    with np.errstate(invalid="ignore"):
+        conditions = [
+            np.isnan(do_arr) | np.isnan(temp_arr),
+            do_arr < hypoxic_threshold,
+            do_arr < stress_threshold,
+            temp_arr > heat_threshold,
+        ]
+    codes = np.select(conditions, [_UNKNOWN, _CRITICAL, _STRESSED, _HEAT],
+                      default=_GOOD).astype(np.int8)
+    classes = pd.Categorical.from_codes(codes, categories=WQ_CLASSES)
+    if isinstance(do, pd.Series):
+        return pd.Series(classes, index=do.index, name="wq_class")
+    return classes
+
+
+def classify_water_quality(do, temp, hypoxic_threshold=2.0, stress_threshold=5.0,
+                           heat_threshold=28.0):
+    """Classify a single reading; thin wrapper around the array version."""
+    classes = classify_water_quality_array([do], [temp], hypoxic_threshold,
+                                           stress_threshold, heat_threshold)
+    return classes[0]
@@ -0,0 +1,136 @@
+"""Cloud-optimized GeoTIFF output for derived rasters.
+
+Lecture 6 writes ``mean_annual_precip.tif`` (Exercise 5) and
+``nlcd_reclass.tif`` (Exercise 8) as plain strip GeoTIFFs without
+compression or overviews, so any later read (a zonal window, a map, a
+thumbnail) decodes the whole file. The writers here produce COGs:
+
+1. tiles of ``BLOCKSIZE`` x ``BLOCKSIZE`` pixels, so a window read decodes
+   only the tiles it touches;
+2. DEFLATE compression with the predictor matched to the dtype: horizontal
+   differencing for integers, floating-point prediction for floats;
+3. internal overviews down to about one tile, built with ``average`` for
+   continuous (float) data and ``mode`` for categorical (integer) data, so
+   renders can read a reduced level (``out_shape=``) instead of full
+   resolution.
+
+GDAL's COG driver only copies existing datasets, so the data is first
+written to a temporary tiled GeoTIFF next to the output (array or window by
+window with ``cog_writer``) and then copied with the COG layout.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+BLOCKSIZE = 512
+COMPRESS = "DEFLATE"
+
+
+def cog_options(dtype, compress=COMPRESS, blocksize=BLOCKSIZE):
+    """COG driver creation options for ``dtype`` (predictor matched to it)."""
+    dtype = np.dtype(dtype)
+    if compress.upper() in ("DEFLATE", "LZW", "ZSTD"):
+        predictor = "FLOATING_POINT" if dtype.kind == "f" else "STANDARD"
+    else:
+        predictor = "NO"        # lossy or no compression: predictor does not apply
+    return {"compress": compress, "predictor": predictor,
+            "blocksize": blocksize, "bigtiff": "IF_SAFER"}
+
+
+def default_resampling(dtype):
+    """Overview resampling: ``average`` for floats, ``mode`` for class codes."""
+    return "average" if np.dtype(dtype).kind == "f" else "mode"
+
+
+def write_cog(path, array, transform, crs, nodata=None, resampling=None,
+              compress=COMPRESS, blocksize=BLOCKSIZE):
+    """Write a 2-D (or bands-first 3-D) array as a COG.
+
+    Parameters
+    ----------
+    path : str
+        Output GeoTIFF.
+    array : numpy array
+        ``(rows, cols)`` or ``(bands, rows, cols)``; its dtype is kept.
+    transform : affine.Affine
+        Geotransform of the array.
+    crs : str or rasterio.crs.CRS
+        Coordinate reference system.
+    nodata : number, optional
+        NoData value (NaN is allowed for floats).
+    resampling : str, optional
+        Overview resampling (default: ``default_resampling(array.dtype)``).
+    compress : str
+        GDAL compression (``DEFLATE``, ``ZSTD``, ``LZW``, ...).
+    blocksize : int
+        Tile size in pixels.
+
+    Returns
+    -------
+    str
+        ``path``.
+    """
+    array = np.asarray(array)
+    if array.ndim == 2:
+        array = array[np.newaxis]
+    if array.ndim != 3:
+        raise ValueError("array must be 2-D or (bands, rows, cols)")
+    profile = {"height": array.shape[1], "width": array.shape[2],
+               "count": array.shape[0], "dtype": array.dtype.name,
+               "transform": transform, "crs": crs, "nodata": nodata}
+    with cog_writer(path, profile, resampling, compress, blocksize) as dst:
+        dst.write(array)
+    return path
+
+
+@contextmanager
+def cog_writer(path, profile, resampling=None, compress=COMPRESS, blocksize=BLOCKSIZE):
+    """Dataset to write into (e.g. window by window); becomes a COG on exit.
+
+    ``profile`` is a rasterio profile (``height``, ``width``, ``count``,
+    ``dtype``, ``transform``, ``crs``, ``nodata``); driver and layout
+    options in it are replaced.
+    """
+    import rasterio
+    import rasterio.shutil
+
+    profile = {key: value for key, value in profile.items()
+               if key in ("height", "width", "count", "dtype", "transform", "crs", "nodata")}
+    profile.update(driver="GTiff", tiled=True, blockxsize=blocksize,
+                   blockysize=blocksize, bigtiff="IF_SAFER")
+    resampling = resampling or default_resampling(profile["dtype"])
+
+    fd, tmp = tempfile.mkstemp(suffix=".tif", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        with rasterio.open(tmp, "w", **profile) as dst:
+            yield dst
+        rasterio.shutil.copy(tmp, path, driver="COG",
+                             overview_resampling=resampling.upper(),
+                             **cog_options(profile["dtype"], compress, blocksize))
+    finally:
+        os.remove(tmp)
+
+
+def to_cog(src_path, dst_path=None, resampling=None, compress=COMPRESS, blocksize=BLOCKSIZE):
+    """Rewrite an existing GeoTIFF as a COG (in place if ``dst_path`` is None)."""
+    import rasterio
+    import rasterio.shutil
+
+    with rasterio.open(src_path) as src:
+        dtype = src.dtypes[0]
+    dst_path = dst_path or src_path
+    fd, tmp = tempfile.mkstemp(suffix=".tif", dir=os.path.dirname(os.path.abspath(dst_path)))
+    os.close(fd)
+    try:
+        rasterio.shutil.copy(src_path, tmp, driver="COG",
+                             overview_resampling=(resampling or default_resampling(dtype)).upper(),
+                             **cog_options(dtype, compress, blocksize))
+        os.replace(tmp, dst_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return dst_path
@@ -0,0 +1,146 @@
+"""Ellipsoidal distances, areas and perimeters for whole layers.
+
+Exercise 9 of Lecture 6 calls ``Geod.inv`` for one station pair and
+``Geod.geometry_area_perimeter`` for one watershed, keeping only the
+largest part of a MultiPolygon. Here every measure is taken on the
+ellipsoid of the layer's CRS, for every feature:
+
+- ``geodesic_distance`` / ``distance_matrix``: ``Geod.inv`` on whole
+  coordinate arrays (pairwise, or all pairs in row batches);
+- ``geodesic_measures``: area and perimeter of every polygon with all parts
+  and holes. The rings of the whole layer are extracted with one
+  vectorized shapely call into a single coordinate array, each ring is
+  measured with ``Geod.polygon_area_perimeter`` on a slice of it, and the
+  results are summed per feature with ``np.bincount``: exteriors add,
+  holes subtract whatever their orientation (``geometry_area_perimeter``
+  adds a hole that is not clockwise). Perimeters include hole boundaries.
+  With ``compare_crs`` the planar area in that projection and its error
+  against the ellipsoidal area are added as columns.
+
+No projection is needed for the measurements themselves; a projected
+layer is measured on its geographic base CRS.
+"""
+
+import numpy as np
+import pandas as pd
+
+BATCH_PAIRS = 4_000_000     # distance pairs per Geod.inv call in distance_matrix
+
+
+def layer_geod(crs=None, ellps="WGS84"):
+    """``pyproj.Geod`` of ``crs``'s ellipsoid (``ellps`` if no CRS)."""
+    from pyproj import CRS, Geod
+
+    if crs is None:
+        return Geod(ellps=ellps)
+    return CRS.from_user_input(crs).get_geod()
+
+
+def geodesic_distance(lon1, lat1, lon2, lat2, geod=None):
+    """Ellipsoidal distance (m) between matching points of two coordinate arrays."""
+    geod = geod or layer_geod()
+    lon1, lat1, lon2, lat2 = np.broadcast_arrays(*(np.asarray(v, dtype=float)
+                                                   for v in (lon1, lat1, lon2, lat2)))
+    _, _, dist = geod.inv(lon1.ravel(), lat1.ravel(), lon2.ravel(), lat2.ravel())
+    return np.asarray(dist).reshape(lon1.shape)
+
+
+def distance_matrix(lon, lat, lon2=None, lat2=None, geod=None, batch_pairs=BATCH_PAIRS):
+    """``(n, m)`` ellipsoidal distances (m) from every point to every other.
+
+    Without ``lon2``/``lat2`` the points are compared with themselves. Rows
+    are computed in batches of about ``batch_pairs`` pairs.
+    """
+    geod = geod or layer_geod()
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    lon2 = lon if lon2 is None else np.asarray(lon2, dtype=float)
+    lat2 = lat if lat2 is None else np.asarray(lat2, dtype=float)
+    out = np.empty((len(lon), len(lon2)))
+    rows = max(1, batch_pairs // max(len(lon2), 1))
+    for start in range(0, len(lon), rows):
+        stop = min(start + rows, len(lon))
+        out[start:stop] = geodesic_distance(lon[start:stop, None], lat[start:stop, None],
+                                            lon2[None, :], lat2[None, :], geod)
+    return out
+
+
+def points_lonlat(gdf):
+    """Longitude and latitude arrays of a point layer (any CRS)."""
+    lonlat = _geographic(gdf)
+    return lonlat.geometry.x.to_numpy(), lonlat.geometry.y.to_numpy()
+
+
+def geodesic_measures(gdf, compare_crs=None):
+    """Ellipsoidal area (km²) and perimeter (km) of every polygon of ``gdf``.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame or GeoSeries
+        Polygons or multipolygons with a CRS. All parts and holes count.
+    compare_crs : optional
+        Projected CRS (e.g. ``"EPSG:32618"``) whose planar area is reported
+        next to the ellipsoidal one.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Aligned to ``gdf.index``: ``area_geod_km2``, ``perimeter_geod_km``
+        and, with ``compare_crs``, ``area_proj_km2`` and
+        ``area_error_pct`` (projected minus ellipsoidal, in % of the
+        ellipsoidal area). Empty or missing geometries get NaN.
+    """
+    import shapely
+
+    lonlat = _geographic(gdf)
+    geod = layer_geod(lonlat.crs)
+    geoms = np.asarray(lonlat.geometry.values, dtype=object)
+
+    parts, part_owner = shapely.get_parts(geoms, return_index=True)
+    polygonal = shapely.get_type_id(parts) == 3
+    parts, part_owner = parts[polygonal], part_owner[polygonal]
+    # Rings in order: each polygon's exterior (adds area), then its holes
+    rings, ring_part = shapely.get_rings(parts, return_index=True)
+    ring_owner = part_owner[ring_part]
+    ring_sign = np.where(np.r_[True, ring_part[1:] != ring_part[:-1]], 1.0, -1.0)
+
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+    lon, lat = np.ascontiguousarray(coords[:, 0]), np.ascontiguousarray(coords[:, 1])
+    starts = np.flatnonzero(np.diff(ring_index, prepend=-1))
+    stops = np.r_[starts[1:], len(coords)]
+    # One C call per ring on contiguous slices of the layer's coordinates
+    ring_area, ring_length = np.array(
+        [geod.polygon_area_perimeter(lon[a:b], lat[a:b]) for a, b in zip(starts, stops)]
+    ).reshape(-1, 2).T
+    ring_ids = ring_index[starts]
+    owner = ring_owner[ring_ids]
+    n = len(geoms)
+    area = np.bincount(owner, weights=ring_sign[ring_ids] * np.abs(ring_area), minlength=n)
+    perimeter = np.bincount(owner, weights=ring_length, minlength=n)
+
+    valid = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+    table = pd.DataFrame({"area_geod_km2": np.where(valid, area / 1e6, np.nan),
+                          "perimeter_geod_km": np.where(valid, perimeter / 1e3, np.nan)},
+                         index=gdf.index)
+    if compare_crs is not None:
+        from eds.reproject import to_crs
+
+        projected = to_crs(gdf.geometry, compare_crs)
+        table["area_proj_km2"] = np.where(valid, projected.area.to_numpy() / 1e6, np.nan)
+        table["area_error_pct"] = ((table["area_proj_km2"] - table["area_geod_km2"])
+                                   / table["area_geod_km2"] * 100)
+    return table
+
+
+def _geographic(gdf):
+    """``gdf`` in its geographic base CRS (lon/lat on the same ellipsoid)."""
+    from pyproj import CRS
+
+    from eds.reproject import to_crs
+
+    if gdf.crs is None:
+        raise ValueError("geodesic measures need a layer with a CRS")
+    crs = CRS.from_user_input(gdf.crs)
+    if crs.is_geographic:
+        return gdf
+    return to_crs(gdf, crs.geodetic_crs)
+
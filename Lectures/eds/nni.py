@@ -0,0 +1,98 @@
+"""Nearest-neighbor distances and the Clark-Evans nearest neighbor index.
+
+Lecture 7 Exercise 2 builds the full n x n ``cdist`` matrix to find each
+point's nearest neighbor, which needs O(n^2) memory. The functions here
+query a KD-tree instead, so memory stays linear in n (n x k results) and
+200k-point inventories run in seconds.
+
+Distances match the dense matrix exactly. Coincident points are each
+other's neighbors at distance 0, as with ``fill_diagonal(dmat, inf)``;
+only a point's own entry is excluded. Among neighbors at exactly the same
+distance the tree may report a different one than ``argmin`` would.
+"""
+
+import numpy as np
+from scipy.spatial import ConvexHull, cKDTree
+from scipy.stats import norm
+
+# Standard error constant for the Clark-Evans test
+CLARK_EVANS_SE = 0.26136
+
+
+def nearest_neighbors(coords, k=1, workers=-1):
+    """Distances and indices of each point's ``k`` nearest other points.
+
+    Returns ``(distances, indices)``, each of shape ``(n,)`` for ``k=1`` or
+    ``(n, k)`` otherwise, sorted from nearest to farthest.
+    """
+    coords = _as_coords(coords)
+    n = len(coords)
+    if not 1 <= k < n:
+        raise ValueError(f"k must be between 1 and n - 1 = {n - 1}")
+    dist, idx = cKDTree(coords).query(coords, k=k + 1, workers=workers)
+
+    # Drop each point's own entry. It is normally column 0, but with
+    # duplicate coordinates it can be any column at distance 0 (or be
+    # pushed out of the k + 1 results entirely, then drop the last column).
+    is_self = idx == np.arange(n)[:, None]
+    is_self[~is_self.any(axis=1), -1] = True
+    dist = dist[~is_self].reshape(n, k)
+    idx = idx[~is_self].reshape(n, k)
+    if k == 1:
+        return dist[:, 0], idx[:, 0]
+    return dist, idx
+
+
+def kth_neighbor_distance(coords, k, workers=-1):
+    """Distance from each point to its ``k``-th nearest other point."""
+    dist, _ = nearest_neighbors(coords, k=k, workers=workers)
+    return dist if k == 1 else dist[:, -1]
+
+
+def clark_evans(coords, area=None, nn_dists=None):
+    """Clark-Evans nearest neighbor index with its z-score and p-value.
+
+    ``area`` defaults to the convex hull of the points. Pass ``nn_dists``
+    to reuse distances from ``nearest_neighbors``.
+
+    Returns a dict with ``n``, ``area``, ``d_obs`` (mean NN distance),
+    ``d_exp`` (expected under complete spatial randomness), ``nni``,
+    ``se``, ``z``, ``p_value`` (two-sided) and ``pattern``
+    (``"CLUSTERED"``, ``"DISPERSED"`` or ``"RANDOM"``).
+    """
+    coords = _as_coords(coords)
+    n = len(coords)
+    if nn_dists is None:
+        nn_dists, _ = nearest_neighbors(coords)
+    if area is None:
+        area = ConvexHull(coords).volume    # in 2-D, "volume" is the area
+
+    d_obs = float(np.mean(nn_dists))
+    d_exp = 1 / (2 * np.sqrt(n / area))
+    se = CLARK_EVANS_SE / np.sqrt(n ** 2 / area)
+    z = (d_obs - d_exp) / se
+    nni = d_obs / d_exp
+    if nni < 1:
+        pattern = "CLUSTERED"
+    elif nni > 1:
+        pattern = "DISPERSED"
+    else:
+        pattern = "RANDOM"
+    return {
+        "n": n,
+        "area": float(area),
+        "d_obs": d_obs,
+        "d_exp": float(d_exp),
+        "nni": float(nni),
+        "se": float(se),
+        "z": float(z),
+        "p_value": float(2 * (1 - norm.cdf(abs(z)))),
+        "pattern": pattern,
+    }
+
+
+def _as_coords(coords):
+    coords = np.asarray(coords, dtype=float)
+    if coords.ndim != 2 or coords.shape[1] != 2:
+        raise ValueError("coords must have shape (n, 2)")
+    return coords
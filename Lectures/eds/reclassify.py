@@ -0,0 +1,205 @@
+"""Raster reclassification compiled to a single digitize or lookup gather.
+
+Exercise 4 of Lecture 6 builds the DEM elevation zones with three
+boolean-mask assignments over a float64 copy, and Exercise 8 reclassifies
+NLCD with four ``np.isin`` passes. A ``Reclassifier`` compiles the rules
+once:
+
+- ``from_breaks`` (continuous rasters): ``[(lower, upper, class), ...]``
+  intervals ``lower <= value < upper`` become one sorted edge array; a
+  value is classified with one ``np.digitize`` plus a gather from the bin
+  to its class;
+- ``from_codes`` (categorical rasters): ``{class: [codes]}`` becomes a
+  lookup table indexed by the code, so classifying is one gather
+  (``lut[codes]``; 256 entries for uint8 NLCD).
+
+Values outside every rule (and NaN / the raster's nodata value) get
+``nodata_class``. The output uses the smallest integer dtype that holds all
+classes (uint8 for a handful of zones). Arrays can be reclassified into a
+preallocated ``out`` array or in place, and whole GeoTIFFs can be
+reclassified window by window with ``reclassify_raster``.
+"""
+
+import numpy as np
+
+INPLACE_ROWS = 1024      # rows per chunk when reclassifying in place
+
+
+class Reclassifier:
+    """Compiled reclassification rules; call it on an array."""
+
+    def __init__(self, edges=None, bin_classes=None, lut=None, lut_offset=0,
+                 default=0, nodata=None, nodata_class=0):
+        self.edges = edges
+        self.bin_classes = bin_classes
+        self.lut = lut
+        self.lut_offset = lut_offset
+        self.default = default
+        self.nodata = nodata
+        self.nodata_class = nodata_class
+        classes = [default, nodata_class]
+        classes += list(bin_classes) if bin_classes is not None else list(lut)
+        self.dtype = smallest_int_dtype(min(classes), max(classes))
+        if bin_classes is not None:
+            self.bin_classes = np.asarray(bin_classes, dtype=self.dtype)
+        if lut is not None:
+            self.lut = np.asarray(lut, dtype=self.dtype)
+
+    @classmethod
+    def from_breaks(cls, breaks, nodata=None, nodata_class=0):
+        """Rules ``[(lower, upper, class), ...]`` for ``lower <= value < upper``.
+
+        Use ``-np.inf`` / ``np.inf`` for open-ended intervals (the infinities
+        themselves are not included). Intervals must not overlap; gaps
+        between them get ``nodata_class``.
+        """
+        breaks = [(float(lo), float(hi), int(c)) for lo, hi, c in breaks]
+        edges = sorted({e for lo, hi, _ in breaks for e in (lo, hi)})
+        # np.digitize gives bin i for edges[i-1] <= value < edges[i]
+        bin_classes = [None] * (len(edges) + 1)
+        for lo, hi, c in breaks:
+            if lo >= hi:
+                raise ValueError(f"empty interval [{lo}, {hi})")
+            first, stop = edges.index(lo) + 1, edges.index(hi) + 1
+            if any(b is not None for b in bin_classes[first:stop]):
+                raise ValueError(f"interval [{lo}, {hi}) overlaps another one")
+            bin_classes[first:stop] = [c] * (stop - first)
+        bin_classes = [nodata_class if b is None else b for b in bin_classes]
+        return cls(edges=np.asarray(edges), bin_classes=bin_classes,
+                   default=nodata_class, nodata=nodata, nodata_class=nodata_class)
+
+    @classmethod
+    def from_codes(cls, code_map, default=0, nodata=None, nodata_class=0,
+                   size=None):
+        """Rules ``{class: [codes]}`` for integer rasters.
+
+        Codes not listed get ``default``; the raster's ``nodata`` code gets
+        ``nodata_class``. ``size`` fixes the table length (e.g. 256 so that
+        any uint8 value can be looked up without a range check).
+        """
+        codes = [int(c) for old in code_map.values() for c in np.atleast_1d(old)]
+        if nodata is not None:
+            codes.append(int(nodata))
+        lo = min(0, min(codes)) if codes else 0
+        hi = max(codes) if codes else 0
+        length = max(size or 0, hi - lo + 1)
+        lut = np.full(length, default, dtype=np.int64)
+        for new, old in code_map.items():
+            lut[np.atleast_1d(np.asarray(old, dtype=np.int64)) - lo] = new
+        if nodata is not None:
+            lut[int(nodata) - lo] = nodata_class
+        return cls(lut=lut, lut_offset=lo, default=default, nodata=nodata,
+                   nodata_class=nodata_class)
+
+    def __call__(self, values, out=None):
+        """Class of every value; written into ``out`` if given."""
+        values = np.asarray(values)
+        if out is None:
+            out = np.empty(values.shape, dtype=self.dtype)
+        if self.lut is not None:
+            self._apply_lut(values, out)
+        else:
+            self._apply_breaks(values, out)
+        return out
+
+    def inplace(self, array, rows=INPLACE_ROWS):
+        """Reclassify ``array`` in place (its dtype must hold the classes).
+
+        Works in row chunks, so the only temporary is one chunk of classes.
+        """
+        if not np.can_cast(self.dtype, array.dtype, casting="safe") and \
+                not np.issubdtype(array.dtype, np.floating):
+            raise TypeError(f"{array.dtype} cannot hold classes of type {self.dtype}")
+        for start in range(0, array.shape[0], rows):
+            block = array[start:start + rows]
+            block[...] = self(block)
+        return array
+
+    def _apply_lut(self, values, out):
+        if not np.issubdtype(values.dtype, np.integer):
+            raise TypeError("code maps need an integer raster; use from_breaks")
+        lut = self.lut
+        if self.lut_offset == 0 and values.dtype.itemsize == 1 and \
+                values.dtype.kind == "u" and len(lut) >= 256:
+            np.take(lut, values, out=out)               # uint8: no range check
+            return
+        idx = values.astype(np.int64) - self.lut_offset
+        outside = (idx < 0) | (idx >= len(lut))
+        np.take(lut, np.clip(idx, 0, len(lut) - 1), out=out)
+        out[outside] = self.default
+
+    def _apply_breaks(self, values, out):
+        # NaN sorts after every edge, so it lands in the overflow bin, which
+        # (like the bin below the first edge) holds nodata_class
+        bins = np.digitize(values, self.edges, right=False)
+        np.take(self.bin_classes, bins, out=out)
+        if self.nodata is not None:
+            out[values == self.nodata] = self.nodata_class
+
+
+def reclassify(values, breaks=None, codes=None, out=None, **kwargs):
+    """One-call form: ``reclassify(dem, breaks=[(0, 100, 1), ...])``."""
+    if (breaks is None) == (codes is None):
+        raise ValueError("pass exactly one of breaks= or codes=")
+    rules = (Reclassifier.from_breaks(breaks, **kwargs) if breaks is not None
+             else Reclassifier.from_codes(codes, **kwargs))
+    return rules(values, out=out)
+
+
+def reclassify_raster(src_path, dst_path, rules, band=1, workers=None,
+                      window_pixels=None, **cog_kwargs):
+    """Reclassify a GeoTIFF window by window into a new single-band COG.
+
+    Windows are whole internal blocks (``eds.raster_blocks.block_windows``)
+    and run in a thread pool; the output has the rules' dtype and
+    ``nodata = rules.nodata_class``. ``cog_kwargs`` (``compress``,
+    ``blocksize``) go to ``eds.cog.cog_writer``.
+    """
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+
+    import rasterio
+
+    from eds.cog import cog_writer
+    from eds.raster_blocks import WINDOW_PIXELS, block_windows
+
+    with rasterio.open(src_path) as src:
+        profile = src.profile
+        windows = list(block_windows(src, band, window_pixels or WINDOW_PIXELS))
+        if rules.nodata is None and src.nodata is not None:
+            raise ValueError("the raster has a nodata value; compile the rules "
+                             f"with nodata={src.nodata}")
+    profile.update(count=1, dtype=np.dtype(rules.dtype).name,
+                   nodata=rules.nodata_class)
+
+    local = threading.local()
+    handles = []
+
+    def run(window):
+        if not hasattr(local, "src"):
+            local.src = rasterio.open(src_path)
+            handles.append(local.src)
+        return window, rules(local.src.read(band, window=window))
+
+    workers = workers or os.cpu_count()
+    try:
+        with cog_writer(dst_path, profile, resampling="mode", **cog_kwargs) as dst, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(windows), 2 * workers):
+                for window, classes in pool.map(run, windows[start:start + 2 * workers]):
+                    dst.write(classes, 1, window=window)
+    finally:
+        for handle in handles:
+            handle.close()
+    return dst_path
+
+
+def smallest_int_dtype(lo, hi):
+    """Smallest integer dtype holding ``lo`` .. ``hi`` (unsigned if possible)."""
+    for dtype in ((np.uint8, np.uint16, np.uint32, np.uint64) if lo >= 0
+                  else (np.int8, np.int16, np.int32, np.int64)):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(dtype)
+    raise ValueError(f"no integer dtype holds {lo}..{hi}")
@@ -0,0 +1,130 @@
+"""Raster maps read at display resolution instead of full resolution.
+
+The DEM panels of Exercise 4 in Lecture 6 pass the full-resolution array to
+``imshow``, and Matplotlib then resamples millions of pixels down to the few
+hundred that fit in a 150 dpi axes. For a continental raster the read alone
+takes minutes and gigabytes. Here:
+
+1. ``display_shape`` turns the axes size (figure inches x axes fraction x
+   dpi) into the pixel grid the map will actually occupy;
+2. ``read_display`` asks rasterio for the raster (or a window of it)
+   resampled to that grid with ``out_shape``. GDAL serves the read from the
+   smallest internal overview that is still at least that fine (COGs from
+   ``eds.cog``) or, without overviews, decimates the full-resolution rows;
+3. ``show_raster`` draws the result with the right ``extent``.
+
+Memory and time scale with the figure size, not the raster size. Reads
+never upsample: a raster smaller than the axes is read as is.
+
+``add_boundaries`` overlays polygon outlines (exteriors and holes) as one
+``LineCollection`` built from a single vectorized coordinate extraction,
+instead of one ``ax.plot`` call - and one Line2D artist - per ring.
+"""
+
+import numpy as np
+
+SAVE_DPI = 150      # dpi used by the lecture scripts' savefig calls
+
+
+def display_shape(ax, dpi=None):
+    """``(rows, cols)`` of device pixels covered by ``ax`` when saved at ``dpi``."""
+    fig = ax.figure
+    dpi = dpi or fig.dpi
+    box = ax.get_position()
+    width_in, height_in = fig.get_size_inches()
+    return (max(1, int(np.ceil(box.height * height_in * dpi))),
+            max(1, int(np.ceil(box.width * width_in * dpi))))
+
+
+def read_shape(height, width, target):
+    """Read shape for a ``height`` x ``width`` raster shown on ``target`` pixels.
+
+    Uses one reduction factor for both axes, chosen so that neither axis
+    drops below the target; never larger than the raster itself.
+    """
+    factor = max(1.0, min(height / target[0], width / target[1]))
+    return (max(1, int(np.ceil(height / factor))), max(1, int(np.ceil(width / factor))))
+
+
+def read_display(path, target, band=1, window=None, resampling=None, masked=True):
+    """Read ``band`` of ``path`` resampled to at most display resolution.
+
+    Parameters
+    ----------
+    path : str
+        Raster file (overviews make this fast, see ``eds.cog``).
+    target : tuple of int or matplotlib Axes
+        ``(rows, cols)`` of display pixels, or an axes (``display_shape``
+        at ``SAVE_DPI``).
+    band : int
+        Band to read.
+    window : rasterio.windows.Window, optional
+        Part of the raster to read (default: all).
+    resampling : str, optional
+        rasterio resampling name. Default ``nearest`` (a decimated read,
+        exact for class codes); ``average`` is smoother for continuous
+        data but reads more source pixels when there are no overviews.
+    masked : bool
+        Return a masked array with the nodata pixels masked.
+
+    Returns
+    -------
+    array : numpy array (masked if ``masked``)
+    extent : tuple
+        ``(left, right, bottom, top)`` for ``imshow``.
+    """
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.windows import Window, bounds
+
+    if hasattr(target, "figure"):
+        target = display_shape(target, SAVE_DPI)
+    with rasterio.open(path) as src:
+        window = window or Window(0, 0, src.width, src.height)
+        shape = read_shape(int(window.height), int(window.width), target)
+        data = src.read(band, window=window, out_shape=shape, masked=masked,
+                        resampling=Resampling[resampling or "nearest"])
+        left, bottom, right, top = bounds(window, src.transform)
+    return data, (left, right, bottom, top)
+
+
+def show_raster(ax, path, band=1, window=None, resampling=None, dpi=SAVE_DPI,
+                transform=None, **imshow_kwargs):
+    """``imshow`` a raster file on ``ax`` at display resolution.
+
+    ``transform`` (a function of the array read) can reclassify or rescale
+    the pixels before drawing, e.g. ``Reclassifier`` rules. Returns the
+    ``AxesImage``.
+    """
+    data, extent = read_display(path, display_shape(ax, dpi), band, window, resampling)
+    if transform is not None:
+        data = transform(data)
+    imshow_kwargs.setdefault("origin", "upper")
+    imshow_kwargs.setdefault("interpolation", "nearest")
+    return ax.imshow(data, extent=extent, **imshow_kwargs)
+
+
+def boundary_segments(geoms):
+    """Coordinate arrays of every polygon ring (holes included) and line part."""
+    import shapely
+
+    geoms = np.asarray(getattr(geoms, "geometry", geoms), dtype=object)
+    geoms = geoms[~(shapely.is_missing(geoms) | shapely.is_empty(geoms))]
+    parts = shapely.get_parts(geoms)
+    kind = shapely.get_type_id(parts)
+    lines = np.concatenate([shapely.get_rings(parts[kind == 3]),
+                            parts[(kind == 1) | (kind == 2)]])
+    coords, index = shapely.get_coordinates(lines, return_index=True)
+    return np.split(coords, np.flatnonzero(np.diff(index)) + 1) if len(coords) else []
+
+
+def add_boundaries(ax, geoms, color="black", linewidth=0.5, **kwargs):
+    """Draw the outlines of ``geoms`` (GeoSeries, GeoDataFrame or array) on
+    ``ax`` as a single ``LineCollection``; returns the collection."""
+    from matplotlib.collections import LineCollection
+
+    lines = LineCollection(boundary_segments(geoms), colors=color,
+                           linewidths=linewidth, **kwargs)
+    ax.add_collection(lines, autolim=True)
+    ax.autoscale_view()
+    return lines
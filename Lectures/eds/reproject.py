@@ -0,0 +1,113 @@
+"""Session cache of reprojected layers with shared pyproj Transformers.
+
+Lecture 6 reprojects the same layers again and again: ``ws`` to UTM 18N
+(Exercise 2), to the DEM CRS (Exercise 4), to WGS84 (Exercise 7) and to the
+NLCD Albers CRS (Exercises 8 and 9); ``stations_gdf`` to UTM in Exercises 6
+and 9 and again in Lecture 7. ``GeoDataFrame.to_crs`` builds a new
+Transformer and transforms every vertex each time. ``to_crs`` here:
+
+1. keeps one ``pyproj.Transformer`` per (source CRS, target CRS) pair;
+2. identifies a layer by its source CRS and a fingerprint of its geometry
+   (a hash of the coordinates, geometry types and part sizes), so a layer,
+   its copies and re-reads of the same file share one entry;
+3. caches the transformed geometry array per (layer, target CRS) and
+   rebuilds the returned GeoDataFrame from the caller's current attributes,
+   so columns added after the first call are not lost.
+
+A repeated reprojection costs one pass over the coordinates for the
+fingerprint instead of a full transformation. The cache holds the most
+recent ``CACHE_SIZE`` layers; ``clear_cache()`` empties it.
+"""
+
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+CACHE_SIZE = 32
+
+_layers = OrderedDict()       # (src CRS, fingerprint, dst CRS) -> GeometryArray
+
+
+@lru_cache(maxsize=None)
+def _transformer(src_wkt, dst_wkt):
+    from pyproj import Transformer
+    return Transformer.from_crs(src_wkt, dst_wkt, always_xy=True)
+
+
+def get_transformer(src_crs, dst_crs):
+    """Shared ``pyproj.Transformer`` (x/y order) from ``src_crs`` to ``dst_crs``."""
+    from pyproj import CRS
+    return _transformer(CRS.from_user_input(src_crs).to_wkt(),
+                        CRS.from_user_input(dst_crs).to_wkt())
+
+
+def geometry_fingerprint(geoms):
+    """Hash of the geometry types, part / ring structure and coordinates."""
+    import shapely
+
+    geoms = np.asarray(geoms, dtype=object)
+    kind = shapely.get_type_id(geoms)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(kind.astype(np.int8).tobytes())
+    digest.update(shapely.get_num_coordinates(geoms).astype(np.int64).tobytes())
+    # Part and ring sizes only exist for multi-part and polygon geometries;
+    # point layers skip this entirely
+    parts = shapely.get_parts(geoms[kind >= 4])
+    polygons = np.concatenate([geoms[kind == 3], parts[shapely.get_type_id(parts) == 3]])
+    for structure in (parts, shapely.get_rings(polygons)):
+        digest.update(shapely.get_num_coordinates(structure).astype(np.int64).tobytes())
+    digest.update(shapely.get_coordinates(geoms, include_z=True).tobytes())
+    return digest.hexdigest()
+
+
+def to_crs(gdf, crs):
+    """``gdf.to_crs(crs)``, computed once per layer and target CRS per session.
+
+    Works for GeoDataFrames and GeoSeries with a CRS set. The result is a
+    new object; the cached geometry is shared (shapely geometries are
+    immutable) but the attribute columns are copied from ``gdf``.
+    """
+    from pyproj import CRS
+
+    if gdf.crs is None:
+        raise ValueError("cannot reproject a layer without a CRS")
+    src, dst = CRS.from_user_input(gdf.crs), CRS.from_user_input(crs)
+    if src == dst:
+        return gdf.copy()
+
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    key = (src.to_wkt(), geometry_fingerprint(geoms), dst.to_wkt())
+    projected = _layers.get(key)
+    if projected is None:
+        projected = _transform(gdf.geometry.values, get_transformer(src, dst), dst)
+        _layers[key] = projected
+        if len(_layers) > CACHE_SIZE:
+            _layers.popitem(last=False)
+    else:
+        _layers.move_to_end(key)
+
+    out = gdf.copy()
+    if hasattr(out, "set_geometry"):
+        return out.set_geometry(type(gdf.geometry)(projected, index=gdf.index,
+                                                   name=gdf.geometry.name))
+    return type(gdf)(projected, index=gdf.index, name=gdf.name)
+
+
+def clear_cache():
+    """Drop all cached layers and Transformers."""
+    _layers.clear()
+    _transformer.cache_clear()
+
+
+def _transform(values, transformer, dst):
+    """Geometry array ``values`` transformed with ``transformer``, tagged ``dst``."""
+    import shapely
+    from geopandas.array import from_shapely
+
+    geoms = np.asarray(values, dtype=object)
+    has_z = bool(shapely.has_z(geoms).any())
+    geoms = shapely.transform(geoms, lambda xyz: np.column_stack(transformer.transform(*xyz.T)),
+                              include_z=has_z)
+    return from_shapely(geoms, crs=dst)
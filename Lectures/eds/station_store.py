@@ -0,0 +1,264 @@
+"""Packed, memory-mapped store for per-station time series.
+
+Lecture 6 ships one CSV per monitoring station (``station_data/<id>.csv``),
+so every query parses a whole text file. ``import_station_dir`` packs all of
+them into one directory of column arrays sorted by (station, date):
+
+    <store>/index.json          station -> [start, stop) row range, column list
+    <store>/date.<gen>.npy      datetime64[ns], sorted within each station
+    <store>/<column>.<gen>.npy  one float64 array per numeric column
+
+``StationStore`` opens the arrays with ``np.load(mmap_mode="r")``. A read
+for one station and date range looks up the station's row range, finds the
+dates with a binary search, and copies only those rows:
+
+    store = StationStore("station_data.store")
+    store.read("CB5.1", "2015", "2022", columns=["do_mgl", "wtemp_c"])
+    store.read_many(["CB5.1", "CB5.2"], start="2020-06-01")
+
+Only numeric columns are stored; the station ID and date are the keys.
+``index.json`` also records the name, size and mtime of every source CSV;
+``open_station_store`` rebuilds the store when that list changes, so an
+edited, added, removed or replaced (even by an older copy) file is noticed.
+
+A rebuild writes a new generation of arrays (``<gen>`` counts up) and then
+swaps ``index.json`` atomically, so stores already open keep reading their
+own memory-mapped generation; superseded arrays are deleted afterwards
+(which leaves open mappings valid on POSIX).
+"""
+
+import glob
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+INDEX_FILE = "index.json"
+DATE_COLUMN = "date"
+STORE_VERSION = 2
+
+
+class StationStore:
+    """Read-only view of a store written by ``write_station_store``."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as fh:
+            meta = json.load(fh)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"unsupported station store version: {meta.get('version')}")
+        self.meta = meta
+        self.columns = meta["columns"]
+        self._ranges = {sid: tuple(rng) for sid, rng in meta["stations"].items()}
+        files = meta["files"]
+        self._dates = np.load(os.path.join(path, files[DATE_COLUMN]), mmap_mode="r")
+        self._values = {col: np.load(os.path.join(path, files[col]), mmap_mode="r")
+                        for col in self.columns}
+
+    @property
+    def stations(self):
+        return list(self._ranges)
+
+    def __contains__(self, station):
+        return station in self._ranges
+
+    def __len__(self):
+        return len(self._dates)
+
+    def date_range(self, station):
+        """First and last date recorded for ``station``."""
+        start, stop = self._station_rows(station)
+        if start == stop:
+            return pd.NaT, pd.NaT
+        return pd.Timestamp(self._dates[start]), pd.Timestamp(self._dates[stop - 1])
+
+    def rows(self, station, start=None, end=None):
+        """Row slice for ``station`` between ``start`` and ``end`` (inclusive).
+
+        Dates may be anything ``pd.Timestamp`` accepts. A bare year or month
+        for ``end`` (``"2022"``, ``"2022-06"``) covers the whole period, as in
+        pandas partial-string indexing.
+        """
+        base, stop = self._station_rows(station)
+        dates = self._dates[base:stop]
+        lo, hi = 0, len(dates)
+        if start is not None:
+            lo = int(np.searchsorted(dates, _lower_bound(start), side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(dates, _upper_bound(end), side="right"))
+        return slice(base + lo, base + max(lo, hi))
+
+    def read(self, station, start=None, end=None, columns=None):
+        """DataFrame with ``date`` plus the requested columns for one station."""
+        sl = self.rows(station, start, end)
+        columns = self._check_columns(columns)
+        data = {DATE_COLUMN: np.array(self._dates[sl])}
+        data.update({col: np.array(self._values[col][sl]) for col in columns})
+        return pd.DataFrame(data)
+
+    def read_many(self, stations=None, start=None, end=None, columns=None):
+        """Long DataFrame (``station_id``, ``date``, columns) for many stations."""
+        stations = self.stations if stations is None else list(stations)
+        columns = self._check_columns(columns)
+        slices = [self.rows(sid, start, end) for sid in stations]
+        lengths = [sl.stop - sl.start for sl in slices]
+        take = (np.concatenate([np.arange(sl.start, sl.stop) for sl in slices])
+                if slices else np.array([], dtype=np.int64))
+        data = {
+            "station_id": np.repeat(np.array(stations, dtype=object), lengths),
+            DATE_COLUMN: self._dates[take],
+        }
+        data.update({col: self._values[col][take] for col in columns})
+        return pd.DataFrame(data)
+
+    def _station_rows(self, station):
+        try:
+            return self._ranges[station]
+        except KeyError:
+            raise KeyError(f"station {station!r} not in store {self.path}") from None
+
+    def _check_columns(self, columns):
+        if columns is None:
+            return self.columns
+        missing = [col for col in columns if col not in self._values]
+        if missing:
+            raise KeyError(f"columns not in store: {missing}")
+        return list(columns)
+
+
+def write_station_store(path, frames, sources=None, station_ids=None):
+    """Write ``{station_id: DataFrame}`` (each with a ``date`` column) to ``path``.
+
+    Numeric columns shared by the frames are stored; rows are sorted by date
+    within each station. The arrays get new file names and ``index.json`` is
+    replaced last, so new readers only see complete stores and open readers
+    keep their old arrays. ``sources`` (see ``source_stats``) and
+    ``station_ids`` are recorded there for invalidation.
+    """
+    frames = {sid: df for sid, df in frames.items()}
+    columns = None
+    for df in frames.values():
+        numeric = [c for c in df.columns
+                   if c != DATE_COLUMN and pd.api.types.is_numeric_dtype(df[c])]
+        columns = numeric if columns is None else [c for c in columns if c in numeric]
+    columns = columns or []
+
+    os.makedirs(path, exist_ok=True)
+    index_path = os.path.join(path, INDEX_FILE)
+    try:
+        with open(index_path) as fh:
+            generation = int(json.load(fh).get("generation", 0)) + 1
+    except (OSError, ValueError):
+        generation = 1
+    files = {col: f"{col}.{generation}.npy" for col in [DATE_COLUMN] + columns}
+
+    ranges, offset = {}, 0
+    dates, values = [], {col: [] for col in columns}
+    for sid, df in frames.items():
+        df = df.sort_values(DATE_COLUMN, kind="stable")
+        dates.append(pd.to_datetime(df[DATE_COLUMN]).to_numpy(dtype="datetime64[ns]"))
+        for col in columns:
+            values[col].append(df[col].to_numpy(dtype=float, na_value=np.nan))
+        ranges[sid] = [offset, offset + len(df)]
+        offset += len(df)
+
+    np.save(os.path.join(path, files[DATE_COLUMN]),
+            np.concatenate(dates) if dates else np.array([], dtype="datetime64[ns]"))
+    for col in columns:
+        np.save(os.path.join(path, files[col]),
+                np.concatenate(values[col]) if values[col] else np.array([]))
+
+    meta = {"version": STORE_VERSION, "generation": generation, "columns": columns,
+            "files": files, "stations": ranges, "sources": sources,
+            "station_ids": _id_list(station_ids)}
+    fd, tmp = tempfile.mkstemp(dir=path, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, index_path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    _remove_old_arrays(path, keep=set(files.values()))
+    return StationStore(path)
+
+
+def import_station_dir(src_dir, path, station_ids=None, pattern="*.csv"):
+    """Pack every CSV in ``src_dir`` into a store at ``path``.
+
+    File names are ``<station_id>.csv`` with ``/`` in the ID written as
+    ``-``. Pass the real ``station_ids`` (e.g. ``stations_gdf.station_id``)
+    to map file names back to IDs that contain slashes; otherwise the file
+    stem is used as the ID. The IDs are recorded in the store.
+    """
+    by_fname = {}
+    if station_ids is not None:
+        by_fname = {sid.replace("/", "-"): sid for sid in station_ids}
+    files = sorted(glob.glob(os.path.join(src_dir, pattern)))
+    frames = {}
+    for fname in files:
+        stem = os.path.splitext(os.path.basename(fname))[0]
+        frames[by_fname.get(stem, stem)] = pd.read_csv(fname, parse_dates=[DATE_COLUMN])
+    return write_station_store(path, frames, sources=source_stats(files),
+                               station_ids=station_ids)
+
+
+def open_station_store(src_dir, path=None, station_ids=None):
+    """Open the store for ``src_dir``, (re)building it if the CSVs changed.
+
+    ``path`` defaults to ``<src_dir>.store`` next to the source directory.
+    Without ``station_ids`` the IDs recorded in the store are reused on a
+    rebuild; different ``station_ids`` also trigger a rebuild.
+    """
+    path = path or os.path.normpath(src_dir) + ".store"
+    files = glob.glob(os.path.join(src_dir, "*.csv"))
+    try:
+        store = StationStore(path)
+    except (OSError, KeyError, ValueError):
+        store = None
+    if station_ids is None and store is not None:
+        station_ids = store.meta.get("station_ids")
+    if (store is None or store.meta.get("sources") != source_stats(files)
+            or store.meta.get("station_ids") != _id_list(station_ids)):
+        store = import_station_dir(src_dir, path, station_ids)
+    return store
+
+
+def source_stats(files):
+    """``[name, size, mtime_ns]`` of each file, sorted by name."""
+    stats = []
+    for fname in sorted(files):
+        st = os.stat(fname)
+        stats.append([os.path.basename(fname), st.st_size, st.st_mtime_ns])
+    return stats
+
+
+def _id_list(station_ids):
+    """Station IDs as a sorted list of unique strings (JSON-comparable)."""
+    return None if station_ids is None else sorted({str(sid) for sid in station_ids})
+
+
+def _remove_old_arrays(path, keep):
+    """Delete ``.npy`` files of earlier generations; open maps stay valid."""
+    for name in os.listdir(path):
+        if name.endswith(".npy") and name not in keep:
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:     # still mapped on Windows; removed next rebuild
+                pass
+
+
+def _lower_bound(value):
+    return np.datetime64(pd.Timestamp(value), "ns")
+
+
+def _upper_bound(value):
+    """Last instant covered by ``value`` (end of the year/month/day if partial)."""
+    if isinstance(value, str):
+        try:
+            return np.datetime64(pd.Period(value).end_time, "ns")
+        except ValueError:
+            pass
+    return np.datetime64(pd.Timestamp(value), "ns")
@@ -0,0 +1,119 @@
+"""Per-station summaries of the water-quality table in one grouped pass.
+
+``station_summary`` factorizes the station column once and computes every
+statistic with ``np.bincount`` over the integer station codes, instead of
+filtering ``data[data["station"] == st]`` once per station. The table is
+cached per DataFrame object, so repeated lookups (``summarize_station``,
+report loops) read from it directly.
+
+The cache is keyed on the DataFrame object itself. If you modify the frame
+in place, call ``station_summary(data, refresh=True)`` to rebuild it.
+"""
+
+import weakref
+
+import numpy as np
+import pandas as pd
+
+HYPOXIC_THRESHOLD = 2.0   # mg/L, critical hypoxia
+STRESS_THRESHOLD = 6.0    # mg/L, "stressed" reading in the Lecture 2 summary
+
+_CACHE = {}
+
+
+def station_summary(data, station_col="station", temp_col="temp_c",
+                    do_col="do_mg_l", turbidity_col="turbidity_ntu",
+                    hypoxic_threshold=HYPOXIC_THRESHOLD,
+                    stress_threshold=STRESS_THRESHOLD, refresh=False):
+    """Return a per-station summary table indexed by station.
+
+    Columns: ``mean_temp``, ``mean_do``, ``max_turbidity`` (if the turbidity
+    column exists), ``n_obs`` (non-missing temperatures, as in the Lecture 2
+    ``groupby().agg``), ``n_rows``, ``hypoxic_count`` (DO below
+    ``hypoxic_threshold``), ``stressed_count`` and ``prop_stressed``
+    (share of rows with DO below ``stress_threshold``; missing DO counts as
+    not stressed, like ``(do < 6).mean()``).
+    """
+    key = (id(data), station_col, temp_col, do_col, turbidity_col,
+           hypoxic_threshold, stress_threshold)
+    cached = _CACHE.get(key)
+    if not refresh and cached is not None:
+        ref, n_rows, table = cached
+        if ref() is data and n_rows == len(data):
+            return table
+
+    table = _compute_summary(data, station_col, temp_col, do_col,
+                             turbidity_col, hypoxic_threshold, stress_threshold)
+    if cached is None or cached[0]() is not data:
+        # First table for this frame: drop the entry when the frame is freed
+        weakref.finalize(data, _CACHE.pop, key, None)
+    _CACHE[key] = (weakref.ref(data), len(data), table)
+    return table
+
+
+def _compute_summary(data, station_col, temp_col, do_col, turbidity_col,
+                     hypoxic_threshold, stress_threshold):
+    codes, stations = pd.factorize(data[station_col], sort=True)
+    keep = codes >= 0          # rows with a missing station are dropped
+    codes = codes[keep]
+    n = len(stations)
+
+    def column(name):
+        return data[name].to_numpy(dtype=float, na_value=np.nan)[keep]
+
+    def count_and_sum(values):
+        valid = ~np.isnan(values)
+        count = np.bincount(codes, weights=valid, minlength=n)
+        total = np.bincount(codes, weights=np.where(valid, values, 0.0),
+                            minlength=n)
+        return count, total
+
+    temp = column(temp_col)
+    do = column(do_col)
+    n_temp, sum_temp = count_and_sum(temp)
+    n_do, sum_do = count_and_sum(do)
+    n_rows = np.bincount(codes, minlength=n)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table = {
+            "mean_temp": sum_temp / n_temp,
+            "mean_do": sum_do / n_do,
+        }
+    if turbidity_col in data.columns:
+        max_turb = np.full(n, -np.inf)
+        np.fmax.at(max_turb, codes, column(turbidity_col))
+        table["max_turbidity"] = np.where(np.isneginf(max_turb), np.nan, max_turb)
+
+    # NaN comparisons are False, so missing DO never counts as hypoxic/stressed
+    with np.errstate(invalid="ignore"):
+        hypoxic = np.bincount(codes, weights=do < hypoxic_threshold, minlength=n)
+        stressed = np.bincount(codes, weights=do < stress_threshold, minlength=n)
+
+    table.update({
+        "n_obs": n_temp.astype(np.int64),
+        "n_rows": n_rows,
+        "hypoxic_count": hypoxic.astype(np.int64),
+        "stressed_count": stressed.astype(np.int64),
+        "prop_stressed": stressed / n_rows,
+    })
+    index = pd.Index(np.asarray(stations), name=station_col)
+    return pd.DataFrame(table, index=index)
+
+
+def summarize_station(data, station_id, **kwargs):
+    """Summary dict for one station, read from the cached station table.
+
+    Returns None (with a warning) if the station is not in the data.
+    """
+    table = station_summary(data, **kwargs)
+    if station_id not in table.index:
+        print(f"Warning: Station {station_id} not found in data")
+        return None
+    row = table.loc[station_id]
+    return {
+        "station": station_id,
+        "mean_temp": row["mean_temp"],
+        "mean_do": row["mean_do"],
+        "n_observations": int(row["n_rows"]),
+        "hypoxic_count": int(row["hypoxic_count"]),
+    }
@@ -0,0 +1,187 @@
+"""Rule-driven plausibility checks for water-quality readings.
+
+The Lecture 2 Exercise 3 check (temp 0-35, DO 0-15, pH 6-9) is written as
+one long boolean expression. Here each range is declared once as a
+``Rule``. ``compile_rules`` turns a list of rules into a ``Validator``
+that checks all of them on a chunk in one vectorized step:
+
+- ``Validator.check(chunk)`` returns one integer bitmask per row; bit ``i``
+  is set when the row broke rule ``i`` (0 means the row passed);
+- ``ValidationReport`` keeps rows checked, rows flagged and per-rule
+  counts. It is small, mergeable and independent of the file size;
+- ``InvalidRowSink`` appends flagged rows (with their ``row`` number and
+  ``violations`` bitmask) to a CSV file chunk by chunk, so failing rows are
+  never collected in memory.
+
+Missing values never break a rule, matching ``invalid_condition.fillna(False)``
+in the lecture code.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+Rule = namedtuple("Rule", ["name", "column", "min", "max"])
+Rule.__doc__ = """Valid range ``min <= column <= max`` (either bound may be None)."""
+
+VALID_RANGES = {"temp_c": (0, 35), "do_mg_l": (0, 15), "ph": (6, 9)}
+
+
+def range_rules(ranges):
+    """One ``Rule`` per ``{column: (min, max)}`` entry, named ``<column>_range``."""
+    return [Rule(f"{col}_range", col, lo, hi) for col, (lo, hi) in ranges.items()]
+
+
+WQ_RULES = range_rules(VALID_RANGES)
+
+
+class Validator:
+    """A list of rules compiled into column positions, bounds and bit values."""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        if not self.rules:
+            raise ValueError("at least one rule is required")
+        if len({rule.name for rule in self.rules}) != len(self.rules):
+            raise ValueError("rule names must be unique")
+        if len(self.rules) > 64:
+            raise ValueError("at most 64 rules fit in a bitmask")
+        self.names = [rule.name for rule in self.rules]
+        self.columns = list(dict.fromkeys(rule.column for rule in self.rules))
+        self.dtype = np.min_scalar_type((1 << len(self.rules)) - 1)
+        # Column of the stacked value matrix that each rule reads
+        self._col_index = np.array([self.columns.index(rule.column)
+                                    for rule in self.rules])
+        self._lo = np.array([-np.inf if r.min is None else r.min for r in self.rules],
+                            dtype=float)
+        self._hi = np.array([np.inf if r.max is None else r.max for r in self.rules],
+                            dtype=float)
+        self.bits = (np.ones(len(self.rules), dtype=np.uint64)
+                     << np.arange(len(self.rules), dtype=np.uint64)).astype(self.dtype)
+
+    def violations(self, chunk):
+        """Boolean matrix (rows x rules), True where a row breaks a rule."""
+        values = chunk[self.columns].to_numpy(dtype=float, na_value=np.nan)
+        values = values[:, self._col_index]
+        with np.errstate(invalid="ignore"):
+            return (values < self._lo) | (values > self._hi)
+
+    def check(self, chunk):
+        """Per-row bitmask of broken rules (smallest unsigned dtype that fits)."""
+        return self.mask_from(self.violations(chunk))
+
+    def mask_from(self, broken):
+        # Bits are disjoint, so OR-ing them is the same as summing them
+        return np.bitwise_or.reduce(np.where(broken, self.bits, 0).astype(self.dtype),
+                                    axis=1)
+
+    def decode(self, mask):
+        """Names of the rules set in one bitmask value."""
+        mask = int(mask)
+        return [name for name, bit in zip(self.names, self.bits) if mask & int(bit)]
+
+    def describe(self, masks):
+        """Comma-separated rule names for an array of bitmasks."""
+        labels = {int(m): ", ".join(self.decode(m)) for m in np.unique(masks)}
+        return pd.Series(masks).map(labels)
+
+
+def compile_rules(rules=WQ_RULES):
+    """Compile ``rules`` into a ``Validator``."""
+    return Validator(rules)
+
+
+class ValidationReport:
+    """Running counts for one pass; ``merge`` combines partial reports."""
+
+    def __init__(self, validator):
+        self.validator = validator
+        self.rows_checked = 0
+        self.rows_flagged = 0
+        self.rule_counts = np.zeros(len(validator.rules), dtype=np.int64)
+
+    def update(self, broken):
+        """Add a (rows x rules) violation matrix from ``Validator.violations``."""
+        self.rows_checked += len(broken)
+        self.rows_flagged += int(broken.any(axis=1).sum())
+        self.rule_counts += broken.sum(axis=0)
+        return self
+
+    def merge(self, other):
+        if other.validator.names != self.validator.names:
+            raise ValueError("cannot merge reports built from different rules")
+        self.rows_checked += other.rows_checked
+        self.rows_flagged += other.rows_flagged
+        self.rule_counts += other.rule_counts
+        return self
+
+    def to_frame(self):
+        """One row per rule: column, bounds, bit value and failing-row count."""
+        v = self.validator
+        return pd.DataFrame({
+            "column": [r.column for r in v.rules],
+            "min": [r.min for r in v.rules],
+            "max": [r.max for r in v.rules],
+            "bit": v.bits.astype(np.int64),
+            "n_failed": self.rule_counts,
+        }, index=pd.Index(v.names, name="rule"))
+
+    def __repr__(self):
+        return (f"ValidationReport(rows_checked={self.rows_checked}, "
+                f"rows_flagged={self.rows_flagged})")
+
+
+class InvalidRowSink:
+    """Append flagged rows to a CSV file, writing the header only once.
+
+    Each written row keeps its original columns plus ``row`` (0-based
+    position in the input) and ``violations`` (the rule bitmask).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = open(path, "w", newline="")
+        self._header = True
+        self.n_written = 0
+
+    def write(self, chunk, mask, offset=0):
+        flagged = np.flatnonzero(mask)
+        if len(flagged) == 0:
+            return
+        rows = chunk.iloc[flagged].copy()
+        rows.insert(0, "row", offset + flagged)
+        rows["violations"] = mask[flagged]
+        rows.to_csv(self._fh, header=self._header, index=False)
+        self._header = False
+        self.n_written += len(rows)
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def validate_chunks(chunks, rules=WQ_RULES, sink=None):
+    """Check an iterable of DataFrame chunks against ``rules``.
+
+    Flagged rows are written to ``sink`` (a path) when given. Returns the
+    ``ValidationReport``.
+    """
+    validator = compile_rules(rules)
+    report = ValidationReport(validator)
+    out = InvalidRowSink(sink) if sink is not None else None
+    try:
+        for chunk in chunks:
+            broken = validator.violations(chunk)
+            if out is not None:
+                out.write(chunk, validator.mask_from(broken), report.rows_checked)
+            report.update(broken)
+    finally:
+        if out is not None:
+            out.close()
+    return report
@@ -0,0 +1,230 @@
+"""Spatial weights built once per geometry and cached as memory-mapped CSR.
+
+``libpysal.weights.Queen.from_dataframe`` derives contiguity from the
+polygon geometry on every run, which is the slow step before Moran's I.
+``cached_weights`` builds the weights once and stores them in
+``.eds_cache/weights`` next to the source file (e.g.
+chesapeake_watersheds.gpkg):
+
+    <stem>.<kind>.<key>/indptr.npy, indices.npy   binary CSR adjacency (int32
+                                                  indices unless nnz >= 2**31)
+                        data.npy                  binary weights (1.0)
+                        data_r.npy                row-standardized weights
+                        islands.npy               rows without neighbors
+                        meta.json                 kind, parameters, ids
+
+The key is the SHA-256 of the geometry column (WKB) plus the weights
+parameters, so changed boundaries get a new key and the stale entry for
+that stem and kind (e.g. ``knn6``) is removed. Later loads memory-map the
+``.npy`` files instead of recomputing contiguity.
+
+Supported kinds: ``"queen"`` and ``"rook"`` contiguity, ``"knn"`` (``k``
+nearest centroids) and ``"distance"`` (binary distance band with
+``threshold`` in CRS units). Building requires libpysal; loading does not.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import shapely
+from scipy import sparse
+
+from eds.wq_loader import CACHE_DIRNAME
+
+WEIGHTS_SUBDIR = "weights"
+KINDS = ("queen", "rook", "knn", "distance")
+
+
+class SpatialWeights:
+    """CSR spatial weights with the summary attributes used in Lecture 7.
+
+    ``sparse`` is the binary adjacency and ``sparse_r`` the row-standardized
+    matrix, both as ``scipy.sparse.csr_matrix`` over memory-mapped arrays.
+    """
+
+    def __init__(self, indptr, indices, data, data_r, islands, meta):
+        n = len(indptr) - 1
+        self.sparse = sparse.csr_matrix((data, indices, indptr), shape=(n, n), copy=False)
+        self.sparse_r = sparse.csr_matrix((data_r, indices, indptr), shape=(n, n),
+                                          copy=False)
+        self.islands = [int(i) for i in islands]
+        self.meta = meta
+        self.kind = meta["kind"]
+        self.ids = meta.get("ids")
+
+    @property
+    def n(self):
+        return self.sparse.shape[0]
+
+    @property
+    def cardinalities(self):
+        return np.diff(self.sparse.indptr)
+
+    @property
+    def mean_neighbors(self):
+        return float(self.cardinalities.mean())
+
+    @property
+    def min_neighbors(self):
+        return int(self.cardinalities.min())
+
+    @property
+    def max_neighbors(self):
+        return int(self.cardinalities.max())
+
+    def to_libpysal(self, transform="r"):
+        """Equivalent ``libpysal.weights.W`` (ids are row positions)."""
+        from libpysal.weights import WSP
+
+        w = WSP(sparse.csr_matrix(self.sparse)).to_W(silence_warnings=True)
+        w.transform = transform
+        return w
+
+
+def cached_weights(gdf, kind="queen", source=None, cache_dir=None, k=None,
+                   threshold=None, ids=None, refresh=False):
+    """Spatial weights for ``gdf``, read from the cache when possible.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame or GeoSeries
+        Features in row order; weights use row positions.
+    kind : {"queen", "rook", "knn", "distance"}
+    source : str, optional
+        File the features came from; the cache goes in ``.eds_cache``
+        next to it and is named after its stem.
+    cache_dir : str, optional
+        Explicit cache directory (required if ``source`` is not given).
+    k : int
+        Neighbors for ``kind="knn"``.
+    threshold : float
+        Distance band for ``kind="distance"`` (CRS units).
+    ids : sequence, optional
+        Feature IDs (e.g. HUC8) to record alongside the weights.
+    refresh : bool
+        Rebuild even if a cache entry exists.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+    if kind == "knn" and k is None:
+        raise ValueError("kind='knn' needs k")
+    if kind == "distance" and threshold is None:
+        raise ValueError("kind='distance' needs threshold")
+    if cache_dir is None:
+        if source is None:
+            raise ValueError("pass source (the data file) or cache_dir")
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(source)),
+                                 CACHE_DIRNAME, WEIGHTS_SUBDIR)
+    stem = os.path.splitext(os.path.basename(source))[0] if source else "weights"
+
+    params = {}
+    if kind == "knn":
+        params = {"k": k}
+    elif kind == "distance":
+        params = {"threshold": threshold}
+    key = weights_key(gdf, kind, params)
+    label = kind + "".join(f"{v:g}" for v in params.values())   # e.g. knn6
+    entry = os.path.join(cache_dir, f"{stem}.{label}.{key[:16]}")
+    if not refresh and os.path.exists(os.path.join(entry, "meta.json")):
+        return load_weights(entry)
+
+    adjacency = build_adjacency(gdf, kind, **params)
+    meta = {"kind": kind, "params": params, "key": key,
+            "ids": None if ids is None else [_json_id(i) for i in ids]}
+    os.makedirs(cache_dir, exist_ok=True)
+    _remove_stale(cache_dir, f"{stem}.{label}.", keep=entry)
+    save_weights(entry, adjacency, meta)
+    return load_weights(entry)
+
+
+def weights_key(gdf, kind, params):
+    """SHA-256 over the geometry WKB, the CRS and the weights parameters."""
+    geoms = getattr(gdf, "geometry", gdf)
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"kind": kind, "params": params,
+                              "crs": str(getattr(geoms, "crs", None))},
+                             sort_keys=True).encode())
+    for wkb in shapely.to_wkb(np.asarray(geoms), hex=False):
+        digest.update(len(wkb).to_bytes(8, "little"))
+        digest.update(wkb)
+    return digest.hexdigest()
+
+
+def build_adjacency(gdf, kind, k=None, threshold=None):
+    """Binary CSR adjacency for ``gdf`` rows, built with libpysal."""
+    from libpysal import weights as lpw
+    import geopandas as gpd
+
+    if not isinstance(gdf, gpd.GeoDataFrame):
+        gdf = gpd.GeoDataFrame(geometry=gdf)
+    gdf = gdf[[gdf.geometry.name]].reset_index(drop=True)
+    if kind == "queen":
+        w = lpw.Queen.from_dataframe(gdf, use_index=False, silence_warnings=True)
+    elif kind == "rook":
+        w = lpw.Rook.from_dataframe(gdf, use_index=False, silence_warnings=True)
+    elif kind == "knn":
+        w = lpw.KNN.from_dataframe(gdf, k=k, use_index=False, silence_warnings=True)
+    else:
+        w = lpw.DistanceBand.from_dataframe(gdf, threshold=threshold, binary=True,
+                                            use_index=False, silence_warnings=True)
+    adjacency = sparse.csr_matrix(w.sparse, dtype=float)
+    adjacency.data[:] = 1.0
+    adjacency.sort_indices()
+    return adjacency
+
+
+def save_weights(path, adjacency, meta):
+    """Write one cache entry (atomically: temp directory, then rename)."""
+    adjacency = sparse.csr_matrix(adjacency, dtype=float)
+    row_sums = np.asarray(adjacency.sum(axis=1)).ravel()
+    scale = np.divide(1.0, row_sums, out=np.zeros_like(row_sums), where=row_sums != 0)
+    data_r = adjacency.data * np.repeat(scale, np.diff(adjacency.indptr))
+
+    # scipy keeps int32 CSR indices whenever they fit and would copy int64
+    # ones down to int32, so store the dtype csr_matrix can wrap as is
+    n = adjacency.shape[0]
+    index_dtype = np.int32 if max(adjacency.nnz, n) < 2**31 else np.int64
+
+    parent = os.path.dirname(os.path.abspath(path))
+    tmp = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+    try:
+        np.save(os.path.join(tmp, "indptr.npy"), adjacency.indptr.astype(index_dtype))
+        np.save(os.path.join(tmp, "indices.npy"), adjacency.indices.astype(index_dtype))
+        np.save(os.path.join(tmp, "data.npy"), adjacency.data)
+        np.save(os.path.join(tmp, "data_r.npy"), data_r)
+        np.save(os.path.join(tmp, "islands.npy"), np.flatnonzero(row_sums == 0))
+        with open(os.path.join(tmp, "meta.json"), "w") as fh:
+            json.dump(meta, fh)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_weights(path):
+    """Open a cache entry with its arrays memory-mapped."""
+    with open(os.path.join(path, "meta.json")) as fh:
+        meta = json.load(fh)
+
+    def array(name):
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+    return SpatialWeights(array("indptr"), array("indices"), array("data"),
+                          array("data_r"), array("islands"), meta)
+
+
+def _remove_stale(cache_dir, prefix, keep):
+    for name in os.listdir(cache_dir):
+        full = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and full != keep and os.path.isdir(full):
+            shutil.rmtree(full, ignore_errors=True)
+
+
+def _json_id(value):
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,179 @@
+"""Typed, cached loader for the Lecture 2 water_quality.csv.
+
+``load_water_quality`` parses the CSV once with explicit dtypes
+(categorical station, datetime64 date, float32 measurements) and the
+``-999``/``-9999`` sentinels already turned into NaN. The parsed table is
+written to an uncompressed Feather (Arrow IPC) cache next to the source
+file; later loads read that cache through a memory map instead of
+re-parsing the text. Converting to pandas is not free: numeric columns
+without missing values stay read-only views of the mapped file, but columns
+with missing values (filled with NaN) and the station codes (built into a
+Categorical) are copied once.
+
+The cache is keyed on the source file's SHA-256. A small JSON sidecar
+stores the file's size and mtime, so the hash is only recomputed when
+those change. Editing the CSV therefore invalidates the cache
+automatically.
+
+The data directory defaults to ``Lectures/Data`` in this repository and can
+be overridden with the ``EDS_DATA_DIR`` environment variable or the
+``data_dir`` argument, so no absolute paths need to be baked into scripts.
+
+Feather caching needs ``pyarrow``; without it the loader still works but
+parses the CSV on every call.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    feather = None
+
+DEFAULT_DATA_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "Data")
+)
+WATER_QUALITY_CSV = os.path.join("02_Algorithms", "water_quality.csv")
+CACHE_DIRNAME = ".eds_cache"
+
+NA_VALUES = ["", "NA", "N/A", "-999", "-9999"]
+WQ_DTYPES = {
+    "station": "category",
+    "temp_c": "float32",
+    "do_mg_l": "float32",
+    "ph": "float32",
+    "turbidity_ntu": "float32",
+}
+WQ_DATE_COLUMNS = ["date"]
+
+
+def data_dir(path=None):
+    """Return the course data directory (argument > $EDS_DATA_DIR > repo)."""
+    return path or os.environ.get("EDS_DATA_DIR") or DEFAULT_DATA_DIR
+
+
+def data_path(*parts, base=None):
+    """Join ``parts`` onto the data directory."""
+    return os.path.join(data_dir(base), *parts)
+
+
+def read_water_quality_csv(path, **kwargs):
+    """Parse the CSV text with the typed schema (no caching)."""
+    return pd.read_csv(path, na_values=NA_VALUES, dtype=WQ_DTYPES,
+                       parse_dates=WQ_DATE_COLUMNS, **kwargs)
+
+
+def load_water_quality(path=None, rename_turbidity=False, cache=True,
+                       cache_dir=None, base=None):
+    """Load water_quality.csv as a typed DataFrame.
+
+    Parameters
+    ----------
+    path : str, optional
+        CSV to load. Defaults to ``02_Algorithms/water_quality.csv`` in the
+        data directory.
+    rename_turbidity : bool
+        Rename ``turbidity_ntu`` to ``turbidity`` (Lecture 4 convention).
+    cache : bool
+        Read/write the Feather cache (ignored if pyarrow is missing).
+    cache_dir : str, optional
+        Where to keep the cache; defaults to ``.eds_cache`` next to the CSV.
+    base : str, optional
+        Data directory override (see ``data_dir``).
+    """
+    path = path or data_path(WATER_QUALITY_CSV, base=base)
+    if cache and feather is not None:
+        df = _load_cached(path, cache_dir)
+    else:
+        df = read_water_quality_csv(path)
+    if rename_turbidity:
+        df = df.rename(columns={"turbidity_ntu": "turbidity"})
+    return df
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """SHA-256 of the file contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_cached(path, cache_dir):
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)),
+                                          CACHE_DIRNAME)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    meta_path = os.path.join(cache_dir, stem + ".json")
+
+    stat = os.stat(path)
+    meta = _read_json(meta_path)
+    if meta.get("size") == stat.st_size and meta.get("mtime_ns") == stat.st_mtime_ns:
+        sha = meta["sha256"]
+    else:
+        sha = file_fingerprint(path)
+
+    cache_path = os.path.join(cache_dir, f"{stem}.{sha[:16]}.feather")
+    if os.path.exists(cache_path):
+        if meta.get("sha256") != sha or meta.get("mtime_ns") != stat.st_mtime_ns:
+            _write_meta(meta_path, stat, sha)
+        # split_blocks skips pandas' block consolidation (a second copy of
+        # every float column); self_destruct frees each converted column
+        table = feather.read_table(cache_path, memory_map=True)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    df = read_water_quality_csv(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    _remove_stale(cache_dir, stem, keep=cache_path)
+    _atomic_write(cache_path, lambda tmp: feather.write_feather(
+        pa.Table.from_pandas(df, preserve_index=False), tmp,
+        compression="uncompressed",
+    ))
+    _write_meta(meta_path, stat, sha)
+    return df
+
+
+def _read_json(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(meta_path, stat, sha):
+    meta = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha}
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    _atomic_write(meta_path, lambda tmp: _dump_json(tmp, meta))
+
+
+def _dump_json(path, obj):
+    with open(path, "w") as fh:
+        json.dump(obj, fh)
+
+
+def _remove_stale(cache_dir, stem, keep):
+    for name in os.listdir(cache_dir):
+        full = os.path.join(cache_dir, name)
+        if name.startswith(stem + ".") and name.endswith(".feather") and full != keep:
+            os.remove(full)
+
+
+def _atomic_write(path, write):
+    """Write via a temp file in the same directory, then rename into place."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
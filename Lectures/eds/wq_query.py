@@ -0,0 +1,231 @@
+"""Indexed filtering of the water-quality table (Lecture 2 Exercise 4).
+
+Exercise 4 answers each request with chained boolean masks, so every
+request scans every row. ``WaterQualityIndex`` sorts the row positions
+once by (station, date) and keeps:
+
+- the ``[start, stop)`` range of each station in that order, so station
+  and date predicates are a lookup plus a binary search per station;
+- per-block min/max "zone maps" of the measurement columns, so range
+  predicates skip blocks that cannot contain a match.
+
+Only the rows that survive both steps are tested exactly. Predicates are
+``(column, op, value)`` tuples with ``op`` one of ``<``, ``<=``, ``>``,
+``>=``, ``==`` or ``between`` (``value=(lo, hi)``, inclusive). Missing values
+never match, as with ``fillna(False)`` in the lecture code:
+
+    index = WaterQualityIndex(water_data)
+    index.query(date="2025-07-23",
+                any_of=[("do_mg_l", "<", 6.0), ("turbidity_ntu", ">", 15)])
+    index.query(stations=["CB-5.1", "CB-5.2"],
+                where=[("temp_c", "between", (24, 26))], notna=["do_mg_l"])
+
+Results are rows of the original frame in their original order, so they
+equal the boolean-mask answer. The index does not track later edits to the
+frame; build a new one after modifying it.
+"""
+
+import operator
+
+import numpy as np
+import pandas as pd
+
+ZONE_COLUMNS = ("temp_c", "do_mg_l", "ph", "turbidity_ntu")
+BLOCK_SIZE = 1024
+
+_OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+}
+
+
+class WaterQualityIndex:
+    """Sorted (station, date) index with per-block zone maps."""
+
+    def __init__(self, data, station_col="station", date_col="date",
+                 zone_columns=ZONE_COLUMNS, block_size=BLOCK_SIZE):
+        self.data = data
+        self.station_col = station_col
+        self.date_col = date_col
+        self.block_size = block_size
+
+        codes, stations = pd.factorize(data[station_col], sort=True)
+        dates = pd.to_datetime(data[date_col]).to_numpy(dtype="datetime64[ns]")
+        dates = dates.view(np.int64)    # NaT sorts first, like searchsorted sees it
+        self._order = np.lexsort((dates, codes))
+        self._dates = dates[self._order]
+
+        sorted_codes = codes[self._order]
+        # Code -1 (missing station) gets its own range so date-only queries see it
+        bounds = np.searchsorted(sorted_codes, np.arange(-1, len(stations) + 1))
+        self._group_ranges = list(zip(bounds[:-1], bounds[1:]))
+        self._station_pos = {st: i + 1 for i, st in enumerate(stations)}
+
+        self._sorted = {}
+        self._zones = {}
+        n_blocks = -(-len(data) // block_size)
+        self._block_starts = np.arange(n_blocks) * block_size
+        for col in zone_columns:
+            if col in data.columns:
+                values = self._column(col)
+                if len(self._block_starts):
+                    self._zones[col] = (np.fmin.reduceat(values, self._block_starts),
+                                        np.fmax.reduceat(values, self._block_starts))
+
+    @property
+    def stations(self):
+        return list(self._station_pos)
+
+    def query(self, stations=None, date=None, start=None, end=None,
+              where=(), any_of=(), notna=(), columns=None):
+        """Rows matching every filter, in original row order.
+
+        ``stations`` is a label or list of labels; ``date`` an exact date;
+        ``start``/``end`` inclusive date bounds. ``where`` predicates must all
+        hold, at least one ``any_of`` predicate must hold (if any are given)
+        and ``notna`` columns must be present.
+        """
+        rows = self.query_positions(stations, date, start, end, where, any_of, notna)
+        result = self.data.take(rows)
+        return result if columns is None else result[list(columns)]
+
+    def query_positions(self, stations=None, date=None, start=None, end=None,
+                        where=(), any_of=(), notna=()):
+        """Integer row positions (into ``data``) that match, sorted."""
+        if date is not None:
+            start = end = date
+        lo = None if start is None else _as_ns(start)
+        hi = None if end is None else _as_ns(end)
+
+        starts, stops = self._key_ranges(stations, lo, hi)
+        block_ok = self._block_filter(where, any_of)
+        b = self.block_size
+        touched = np.unique(_expand(starts // b, (stops - 1) // b + 1))
+        # Narrow ranges (a few days per station) are cheaper row by row
+        if block_ok is not None and (stops - starts).sum() < len(touched) * b // 2:
+            block_ok = None
+        if block_ok is None:
+            rows = _expand(starts, stops)
+
+            def values(col):
+                return self._column(col)[rows]
+        else:
+            # Gather whole surviving blocks from a (n_blocks, block_size) view;
+            # the padding past the last row is NaN and never matches
+            blocks = touched[block_ok[touched]]
+            rows = (blocks[:, None] * b + np.arange(b)).ravel()
+
+            def values(col):
+                return self._column(col).reshape(-1, b)[blocks].ravel()
+
+        keep = np.ones(len(rows), dtype=bool)
+        for col, op, value in where:
+            keep &= _evaluate(values(col), op, value)
+        if any_of:
+            hit = np.zeros(len(rows), dtype=bool)
+            for col, op, value in any_of:
+                hit |= _evaluate(values(col), op, value)
+            keep &= hit
+        for col in notna:
+            keep &= ~np.isnan(values(col))
+        rows = rows[keep]
+        if block_ok is not None and not self._covers_all(starts, stops):
+            rows = rows[_in_ranges(rows, starts, stops)]
+        return np.sort(self._order[rows])
+
+    def _key_ranges(self, stations, lo, hi):
+        if stations is None:
+            groups = self._group_ranges
+        else:
+            if isinstance(stations, str) or np.isscalar(stations):
+                stations = [stations]
+            pos = [self._station_pos[s] for s in stations if s in self._station_pos]
+            groups = [self._group_ranges[p] for p in sorted(set(pos))]
+        starts, stops = [], []
+        for g_start, g_stop in groups:
+            dates = self._dates[g_start:g_stop]
+            a = g_start if lo is None else g_start + np.searchsorted(dates, lo, "left")
+            b = g_stop if hi is None else g_start + np.searchsorted(dates, hi, "right")
+            if b > a:
+                starts.append(a)
+                stops.append(b)
+        return np.array(starts, dtype=np.int64), np.array(stops, dtype=np.int64)
+
+    def _block_filter(self, where, any_of):
+        """Boolean per block: can its zone maps satisfy the predicates?"""
+        block_ok = None
+        for col, op, value in where:
+            if col in self._zones:
+                ok = _may_match(*self._zones[col], op, value)
+                block_ok = ok if block_ok is None else block_ok & ok
+        if any_of and all(col in self._zones for col, _, _ in any_of):
+            ok = np.zeros(len(self._block_starts), dtype=bool)
+            for col, op, value in any_of:
+                ok |= _may_match(*self._zones[col], op, value)
+            block_ok = ok if block_ok is None else block_ok & ok
+        return block_ok
+
+    def _covers_all(self, starts, stops):
+        return (len(starts) > 0 and starts[0] == 0 and stops[-1] == len(self._order)
+                and bool((starts[1:] == stops[:-1]).all()))
+
+    def _column(self, col):
+        """Values of ``col`` as float in (station, date) order, NaN-padded to
+        a whole number of blocks (cached)."""
+        values = self._sorted.get(col)
+        if values is None:
+            values = np.full(len(self._block_starts) * self.block_size, np.nan)
+            values[:len(self._order)] = self.data[col].to_numpy(
+                dtype=float, na_value=np.nan)[self._order]
+            self._sorted[col] = values
+        return values
+
+
+def _as_ns(value):
+    return pd.Timestamp(value).to_datetime64().astype("datetime64[ns]").view(np.int64)
+
+
+def _expand(starts, stops):
+    """Concatenate ``arange(s, e)`` for each pair, without a Python loop."""
+    lengths = stops - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.array([], dtype=np.int64)
+    offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return np.arange(total, dtype=np.int64) + offsets
+
+
+def _in_ranges(rows, starts, stops):
+    """Which sorted positions fall inside the sorted ``[start, stop)`` ranges."""
+    i = np.searchsorted(starts, rows, "right") - 1
+    return (i >= 0) & (rows < stops[np.maximum(i, 0)])
+
+
+def _evaluate(values, op, value):
+    with np.errstate(invalid="ignore"):
+        if op == "between":
+            lo, hi = value
+            return (values >= lo) & (values <= hi)
+        return _OPS[op](values, value)
+
+
+def _may_match(block_min, block_max, op, value):
+    """Blocks whose [min, max] could contain a matching value (all-NaN: never)."""
+    with np.errstate(invalid="ignore"):
+        if op == "<":
+            return block_min < value
+        if op == "<=":
+            return block_min <= value
+        if op == ">":
+            return block_max > value
+        if op == ">=":
+            return block_max >= value
+        if op == "==":
+            return (block_min <= value) & (block_max >= value)
+        if op == "between":
+            lo, hi = value
+            return (block_max >= lo) & (block_min <= hi)
+    raise ValueError(f"unknown operator: {op!r}")
@@ -0,0 +1,339 @@
+"""Chunked, constant-memory ingest of station water-quality CSVs.
+
+The Lecture 2 pipeline reads the whole CSV with ``pd.read_csv``. For sonde
+feeds that do not fit in memory, ``stream_water_quality`` reads the file in
+chunks, applies the same rules to every chunk and folds the results into
+small per-station accumulators:
+
+- sentinel NAs (``-999``/``-9999`` etc.) via the same ``na_values`` list;
+- the Exercise 3 plausibility rules (``eds.validation``), with per-rule
+  counts and, optionally, the failing rows streamed to a sink CSV;
+- the row-local Exercise 5 derived columns (``derive_columns``);
+- the Exercise 6 station summary (mean temp/DO, max turbidity, counts,
+  proportion stressed).
+
+The accumulators are mergeable (``merge``), so chunks - or whole files -
+can be processed by separate workers and combined afterwards. Counts,
+maxima and proportions match the in-memory path exactly. Means are the
+correctly rounded sum / count regardless of chunking, which is what pandas'
+compensated groupby sums produce; variances use the Chan et al. merge and
+agree to floating-point rounding.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from eds.validation import (InvalidRowSink, ValidationReport, WQ_RULES,
+                            compile_rules)
+from eds.wq_loader import NA_VALUES
+
+STRESS_THRESHOLD = 6.0
+STATION_SUMMARY_COLUMNS = ["station", "mean_temp", "mean_do", "max_turbidity",
+                           "n_obs", "prop_stressed"]
+
+
+class _Grouped:
+    """Base for accumulators keyed by group label (e.g. station ID)."""
+
+    _fields = ()
+
+    def __init__(self):
+        self.keys = pd.Index([], dtype=object)
+        for name, dtype, fill in self._fields:
+            setattr(self, name, np.full(0, fill, dtype=dtype))
+
+    def _align(self, keys):
+        """Map ``keys`` to positions in this accumulator, growing it as needed."""
+        pos = self.keys.get_indexer(keys)
+        new = pd.Index(keys[pos < 0]).unique()
+        if len(new):
+            self.keys = self.keys.append(new)
+            for name, dtype, fill in self._fields:
+                grown = np.full(len(new), fill, dtype=dtype)
+                setattr(self, name, np.concatenate([getattr(self, name), grown]))
+            pos = self.keys.get_indexer(keys)
+        return pos
+
+    def update(self, keys, values):
+        """Fold in one batch of ``(group label, value)`` rows."""
+        codes, uniques, keep = factorize_keys(keys)
+        return self.update_codes(codes, uniques, np.asarray(values)[keep])
+
+
+class GroupedMoments(_Grouped):
+    """Per-group count, mean, variance, min and max of one numeric column.
+
+    NaN values are skipped, as in pandas' ``mean``/``var``/``max``. Each
+    group's sum is carried as an unevaluated pair ``sum_hi + sum_lo`` built
+    with ``math.fsum``, so the final mean is the correctly rounded
+    sum / count no matter how the rows were split into chunks.
+    """
+
+    _fields = (
+        ("count", np.int64, 0),
+        ("sum_hi", np.float64, 0.0),
+        ("sum_lo", np.float64, 0.0),
+        ("m2", np.float64, 0.0),       # sum of squared deviations
+        ("max", np.float64, -np.inf),
+        ("min", np.float64, np.inf),
+    )
+
+    def update_codes(self, codes, uniques, values):
+        """Like ``update`` with labels already factorized (see factorize_keys)."""
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        codes, values = codes[valid], values[valid]
+        k = len(uniques)
+
+        n = np.bincount(codes, minlength=k)
+        order = np.argsort(codes, kind="stable")
+        groups = np.split(values[order], np.cumsum(n)[:-1])
+        sums = [_exact_sum(g.tolist()) for g in groups]
+        sum_hi = np.array([hi for hi, _ in sums], dtype=float)
+        sum_lo = np.array([lo for _, lo in sums], dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            dev = values - (sum_hi / n)[codes]
+        m2 = np.bincount(codes, weights=dev * dev, minlength=k)
+        vmax = np.full(k, -np.inf)
+        vmin = np.full(k, np.inf)
+        np.maximum.at(vmax, codes, values)
+        np.minimum.at(vmin, codes, values)
+        self._combine(self._align(uniques), n, sum_hi, sum_lo, m2, vmax, vmin)
+        return self
+
+    def merge(self, other):
+        pos = self._align(np.asarray(other.keys, dtype=object))
+        self._combine(pos, other.count, other.sum_hi, other.sum_lo, other.m2,
+                      other.max, other.min)
+        return self
+
+    def _combine(self, pos, n_b, hi_b, lo_b, m2_b, max_b, min_b):
+        n_a = self.count[pos]
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_a = self.sum_hi[pos] / n_a
+            mean_b = hi_b / n_b
+            delta = np.where((n_a > 0) & (n_b > 0), mean_b - mean_a, 0.0)
+            # Chan et al. parallel update of the squared deviations
+            self.m2[pos] += m2_b + delta**2 * np.where(n > 0, n_a * n_b / n, 0.0)
+        for i, p in enumerate(pos):
+            self.sum_hi[p], self.sum_lo[p] = _exact_sum(
+                [self.sum_hi[p], self.sum_lo[p], hi_b[i], lo_b[i]]
+            )
+        self.count[pos] = n
+        self.max[pos] = np.maximum(self.max[pos], max_b)
+        self.min[pos] = np.minimum(self.min[pos], min_b)
+
+    def mean(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return pd.Series(self.sum_hi / self.count, index=self.keys)
+
+    def var(self, ddof=1):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan)
+        return pd.Series(var, index=self.keys)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.var(ddof))
+
+    def maximum(self):
+        return pd.Series(np.where(self.count > 0, self.max, np.nan), index=self.keys)
+
+    def minimum(self):
+        return pd.Series(np.where(self.count > 0, self.min, np.nan), index=self.keys)
+
+    def counts(self):
+        return pd.Series(self.count, index=self.keys)
+
+
+class GroupedProportion(_Grouped):
+    """Per-group share of rows where a boolean flag is True."""
+
+    _fields = (("rows", np.int64, 0), ("hits", np.int64, 0))
+
+    def update_codes(self, codes, uniques, flags):
+        flags = np.asarray(flags, dtype=bool)
+        k = len(uniques)
+        pos = self._align(uniques)
+        self.rows[pos] += np.bincount(codes, minlength=k)
+        self.hits[pos] += np.bincount(codes, weights=flags, minlength=k).astype(np.int64)
+        return self
+
+    def merge(self, other):
+        pos = self._align(np.asarray(other.keys, dtype=object))
+        self.rows[pos] += other.rows
+        self.hits[pos] += other.hits
+        return self
+
+    def proportion(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return pd.Series(self.hits / self.rows, index=self.keys)
+
+
+def factorize_keys(keys):
+    """Integer codes and labels for a batch of group keys; NaN keys dropped."""
+    codes, uniques = pd.factorize(keys)
+    keep = codes >= 0
+    return codes[keep], np.asarray(uniques, dtype=object), keep
+
+
+DO_STATUSES = ["Unknown", "Hypoxic", "Stressed", "Adequate", "Healthy"]
+
+
+def do_status_codes(do):
+    """Exercise 5 DO status as integer positions into ``DO_STATUSES``."""
+    do = np.asarray(do, dtype=float)
+    with np.errstate(invalid="ignore"):
+        conditions = [np.isnan(do), do < 2.0, do < 5.0, do < 8.0]
+    return np.select(conditions, [0, 1, 2, 3], default=4)
+
+
+def do_status(do):
+    """Exercise 5 DO status label for each reading."""
+    return np.asarray(DO_STATUSES, dtype=object)[do_status_codes(do)]
+
+
+def derive_columns(chunk):
+    """Row-local Exercise 5 transforms, safe to apply chunk by chunk.
+
+    ``days_since_start`` and ``temp_zscore`` need whole-file statistics
+    (first date, temperature mean/SD); take those from the stream result.
+    """
+    chunk = chunk.copy()
+    chunk["temp_f"] = chunk["temp_c"] * 9 / 5 + 32
+    chunk["do_percent_sat"] = (chunk["do_mg_l"] / 8.0) * 100
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chunk["log_turbidity"] = np.log(chunk["turbidity_ntu"])
+    chunk["do_status"] = do_status(chunk["do_mg_l"])
+    chunk["month"] = chunk["date"].dt.month_name()
+    chunk["day_of_year"] = chunk["date"].dt.day_of_year
+    return chunk
+
+
+def iter_chunks(path, chunksize=1_000_000, **kwargs):
+    """Yield DataFrame chunks with the Lecture 2 NA handling and date parsing."""
+    return pd.read_csv(path, na_values=NA_VALUES, parse_dates=["date"],
+                       dtype={"station": str}, chunksize=chunksize, **kwargs)
+
+
+class WaterQualityStream:
+    """Mergeable state for one pass over a water-quality file."""
+
+    def __init__(self, rules=WQ_RULES, sink=None):
+        self.n_rows = 0
+        self.na_counts = None
+        self.validation = ValidationReport(compile_rules(rules))
+        self.sink = sink
+        self.first_date = pd.NaT
+        self.last_date = pd.NaT
+        self.temp = GroupedMoments()
+        self.do = GroupedMoments()
+        self.turbidity = GroupedMoments()
+        self.stressed = GroupedProportion()
+        self.do_status = None
+
+    def update(self, chunk):
+        codes, uniques, keep = factorize_keys(chunk["station"])
+        broken = self.validation.validator.violations(chunk)
+        if self.sink is not None:
+            mask = self.validation.validator.mask_from(broken)
+            self.sink.write(chunk, mask, offset=self.n_rows)
+        self.validation.update(broken)
+        self.n_rows += len(chunk)
+        na = chunk.isna().sum()
+        self.na_counts = na if self.na_counts is None else self.na_counts.add(na, fill_value=0)
+        self.first_date = _nanmin(self.first_date, chunk["date"].min())
+        self.last_date = _nanmax(self.last_date, chunk["date"].max())
+
+        def column(name):
+            return chunk[name].to_numpy(dtype=float, na_value=np.nan)[keep]
+
+        do = column("do_mg_l")
+        self.temp.update_codes(codes, uniques, column("temp_c"))
+        self.do.update_codes(codes, uniques, do)
+        self.turbidity.update_codes(codes, uniques, column("turbidity_ntu"))
+        with np.errstate(invalid="ignore"):
+            self.stressed.update_codes(codes, uniques, do < STRESS_THRESHOLD)
+
+        n_status = len(DO_STATUSES)
+        status = np.bincount(codes * n_status + do_status_codes(do),
+                             minlength=len(uniques) * n_status)
+        status = pd.DataFrame(status.reshape(-1, n_status), index=uniques,
+                              columns=DO_STATUSES)
+        self.do_status = status if self.do_status is None else self.do_status.add(status, fill_value=0)
+        return self
+
+    def merge(self, other):
+        self.n_rows += other.n_rows
+        self.na_counts = (other.na_counts if self.na_counts is None
+                          else self.na_counts.add(other.na_counts, fill_value=0))
+        self.validation.merge(other.validation)
+        self.first_date = _nanmin(self.first_date, other.first_date)
+        self.last_date = _nanmax(self.last_date, other.last_date)
+        for name in ("temp", "do", "turbidity", "stressed"):
+            getattr(self, name).merge(getattr(other, name))
+        self.do_status = (other.do_status if self.do_status is None
+                          else self.do_status.add(other.do_status, fill_value=0))
+        return self
+
+    @property
+    def n_invalid(self):
+        """Rows that broke at least one validation rule."""
+        return self.validation.rows_flagged
+
+    def missing_summary(self):
+        """Exercise 3 missing-data table (count and percent per column)."""
+        counts = self.na_counts.astype(np.int64)
+        return pd.DataFrame({"na_count": counts,
+                             "na_percent": (counts / self.n_rows * 100).round(2)})
+
+    def station_summary(self):
+        """Exercise 6 station summary, same columns, order and dtypes as in
+        memory (``station`` is categorical, as from the loader)."""
+        summary = pd.DataFrame({
+            "mean_temp": self.temp.mean(),
+            "mean_do": self.do.mean(),
+            "max_turbidity": self.turbidity.maximum(),
+            "n_obs": self.temp.counts(),
+            "prop_stressed": self.stressed.proportion(),
+        })
+        summary = summary.sort_index()
+        summary.index = pd.CategoricalIndex(summary.index, name="station")
+        return summary.reset_index()[STATION_SUMMARY_COLUMNS]
+
+
+def stream_water_quality(path, chunksize=1_000_000, rules=WQ_RULES, sink=None):
+    """Run the chunked Lecture 2 pipeline over ``path``.
+
+    If ``sink`` is a path, rows failing any rule are appended there as CSV
+    (see ``eds.validation.InvalidRowSink``); the per-rule counts are in
+    ``state.validation``.
+    """
+    out = InvalidRowSink(sink) if sink is not None else None
+    state = WaterQualityStream(rules, sink=out)
+    try:
+        for chunk in iter_chunks(path, chunksize=chunksize):
+            state.update(chunk)
+    finally:
+        if out is not None:
+            out.close()
+        state.sink = None
+    return state
+
+
+def _exact_sum(values):
+    """Return ``(hi, lo)`` with ``hi`` the correctly rounded sum and ``lo`` the
+    rounding error, so ``hi + lo`` carries the sum to ~106 bits."""
+    hi = math.fsum(values)
+    lo = math.fsum(list(values) + [-hi]) if np.isfinite(hi) else 0.0
+    return hi, lo
+
+
+def _nanmin(a, b):
+    return b if pd.isna(a) else a if pd.isna(b) else min(a, b)
+
+
+def _nanmax(a, b):
+    return b if pd.isna(a) else a if pd.isna(b) else max(a, b)
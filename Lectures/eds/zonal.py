@@ -0,0 +1,192 @@
+"""Zonal statistics on in-memory rasters with one rasterized zone grid.
+
+Exercises 7 and 8 of Lecture 6 write ``mean_annual_precip.tif`` and
+``nlcd_reclass.tif`` to disk only so that ``rasterstats.zonal_stats`` can
+read them back, and rasterstats then masks the raster one polygon at a
+time. Here:
+
+1. ``zone_grid`` rasterizes all polygons once into an integer grid on the
+   raster's ``(shape, transform)``: cell value = row position + 1, 0 = no
+   zone;
+2. ``zonal_stats`` and ``zonal_categories`` accumulate count, sum,
+   min/max and category counts for every zone at once with
+   ``np.bincount`` / ``np.minimum.at`` over that grid. ``std`` uses a
+   second pass over deviations from each zone's mean.
+
+Arrays are processed in row blocks, so the temporaries stay small even for
+a full-resolution NLCD grid. A zone grid can be passed back in (``zones=``)
+to summarize several rasters on the same grid without rasterizing again.
+
+Pixels belong to a polygon when their centre is inside it (``all_touched``
+as in rasterstats). Polygons are burned in row order, so where polygons
+overlap a pixel counts for the last one only; HUC8 watersheds do not
+overlap.
+"""
+
+import numpy as np
+import pandas as pd
+
+STATS = ("count", "mean", "min", "max", "std", "sum")
+BLOCK_PIXELS = 4_000_000
+
+
+def zone_grid(gdf, shape, transform, all_touched=False):
+    """Zone-ID grid: row position + 1 of the polygon covering each pixel, 0 elsewhere."""
+    from rasterio import features
+
+    geoms = getattr(gdf, "geometry", gdf)
+    n = len(geoms)
+    dtype = np.uint16 if n < np.iinfo(np.uint16).max else np.int32
+    shapes = ((geom, i + 1) for i, geom in enumerate(geoms)
+              if geom is not None and not geom.is_empty)
+    if n == 0:
+        return np.zeros(shape, dtype=dtype)
+    return features.rasterize(shapes, out_shape=shape, transform=transform,
+                              fill=0, all_touched=all_touched, dtype=dtype)
+
+
+def zonal_stats(gdf, raster, transform=None, stats=("mean", "min", "max", "std"),
+                nodata=None, zones=None, all_touched=False, crs=None, prefix=""):
+    """Summary statistics of ``raster`` per polygon of ``gdf``.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame or GeoSeries
+        Zone polygons, in the raster's CRS (or pass ``crs`` to reproject).
+    raster : 2-D array
+        Raster values (e.g. mean annual precipitation). NaN is ignored.
+    transform : affine.Affine
+        Raster geotransform (needed unless ``zones`` is given).
+    stats : sequence of str
+        Any of ``"count"``, ``"mean"``, ``"min"``, ``"max"``, ``"std"``
+        (population, as in rasterstats) and ``"sum"``.
+    nodata : number, optional
+        Raster value to ignore.
+    zones : 2-D array, optional
+        Precomputed ``zone_grid`` for this raster grid.
+    crs : optional
+        Raster CRS; ``gdf`` is reprojected to it first.
+    prefix : str
+        Prefix for the column names (e.g. ``"precip_"``).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per polygon, aligned to ``gdf.index``. Polygons that cover
+        no valid pixel get NaN (and ``count`` 0).
+    """
+    unknown = set(stats) - set(STATS)
+    if unknown:
+        raise ValueError(f"unknown stats {sorted(unknown)}; choose from {STATS}")
+    raster = np.asarray(raster)
+    zones = _zones(gdf, raster, transform, zones, all_touched, crs)
+    n = len(gdf)
+
+    count = np.zeros(n + 1)
+    total = np.zeros(n + 1)
+    vmin = np.full(n + 1, np.inf)
+    vmax = np.full(n + 1, -np.inf)
+    for z, v in _blocks(zones, raster, nodata):
+        v = v.astype(np.float64, copy=False)     # ufunc.at is fast only for matching dtypes
+        count += np.bincount(z, minlength=n + 1)
+        total += np.bincount(z, weights=v, minlength=n + 1)
+        if "min" in stats:
+            np.minimum.at(vmin, z, v)
+        if "max" in stats:
+            np.maximum.at(vmax, z, v)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+    columns = {"count": count.astype(np.int64), "sum": total, "mean": mean,
+               "min": np.where(count > 0, vmin, np.nan),
+               "max": np.where(count > 0, vmax, np.nan)}
+    if "std" in stats:
+        sq = np.zeros(n + 1)
+        for z, v in _blocks(zones, raster, nodata):
+            dev = v.astype(np.float64, copy=False) - mean[z]
+            sq += np.bincount(z, weights=dev * dev, minlength=n + 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            columns["std"] = np.sqrt(sq / count)
+
+    return pd.DataFrame({prefix + s: columns[s][1:] for s in stats},
+                        index=getattr(gdf, "index", None))
+
+
+def zonal_categories(gdf, raster, transform=None, nodata=None, category_map=None,
+                     zones=None, all_touched=False, crs=None, percent=False):
+    """Pixel count of each category value of ``raster`` per polygon.
+
+    ``category_map`` (e.g. ``{1: "forest", 2: "agr"}``) names the columns
+    and fixes their order; values not in it are dropped. Without it every
+    value present gets a column. Missing combinations are 0. With
+    ``percent=True`` counts become percentages of each polygon's counted
+    pixels. The result is aligned to ``gdf.index``.
+    """
+    raster = np.asarray(raster)
+    if not np.issubdtype(raster.dtype, np.integer):
+        raise ValueError("categorical zonal statistics need an integer raster")
+    zones = _zones(gdf, raster, transform, zones, all_touched, crs)
+    n = len(gdf)
+
+    if category_map is not None:
+        values = np.asarray(list(category_map), dtype=np.int64)
+        names = list(category_map.values())
+    else:
+        present = np.zeros(0, dtype=np.int64)
+        for z, v in _blocks(zones, raster, nodata):
+            present = np.union1d(present, np.unique(v[z > 0]))
+        values, names = present, list(present)
+
+    lo = int(values.min()) if len(values) else 0
+    span = int(values.max()) - lo + 1 if len(values) else 1
+    lut = np.full(span, -1, dtype=np.int64)      # raster value - lo -> column
+    lut[values - lo] = np.arange(len(values))
+
+    # One extra column collects values outside the categories
+    width = len(values) + 1
+    counts = np.zeros((n + 1) * width, dtype=np.int64)
+    for z, v in _blocks(zones, raster, nodata):
+        offset = v.astype(np.int64) - lo
+        col = np.where((offset >= 0) & (offset < span),
+                       lut[np.clip(offset, 0, span - 1)], -1)
+        col[col < 0] = len(values)
+        counts += np.bincount(z * width + col, minlength=len(counts))
+    table = counts.reshape(n + 1, width)[1:, :-1].astype(float if percent else np.int64)
+    if percent:
+        totals = table.sum(axis=1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            table = table / totals * 100
+    return pd.DataFrame(table, columns=names, index=getattr(gdf, "index", None))
+
+
+def _zones(gdf, raster, transform, zones, all_touched, crs):
+    if raster.ndim != 2:
+        raise ValueError("raster must be a 2-D array")
+    if zones is None:
+        if transform is None:
+            raise ValueError("pass the raster transform (or a precomputed zone grid)")
+        if crs is not None and getattr(gdf, "crs", None) is not None:
+            from eds.reproject import to_crs
+            gdf = to_crs(gdf, crs)
+        zones = zone_grid(gdf, raster.shape, transform, all_touched)
+    if zones.shape != raster.shape:
+        raise ValueError(f"zone grid {zones.shape} does not match raster {raster.shape}")
+    return zones
+
+
+def _blocks(zones, raster, nodata):
+    """Zone id and value of every pixel, one row block at a time.
+
+    Invalid pixels (nodata, NaN) are moved to zone 0, which is discarded,
+    so the blocks need no compaction.
+    """
+    rows = max(1, BLOCK_PIXELS // max(raster.shape[1], 1))
+    for start in range(0, raster.shape[0], rows):
+        z = zones[start:start + rows].ravel().astype(np.intp)
+        v = raster[start:start + rows].ravel()
+        invalid = np.zeros(len(v), dtype=bool) if nodata is None else v == nodata
+        if np.issubdtype(v.dtype, np.floating):
+            invalid |= np.isnan(v)
+        if invalid.any():
+            z[invalid] = 0
+        yield z, v